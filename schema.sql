@@ -30,7 +30,28 @@ CREATE INDEX IF NOT EXISTS idx_reviews_bank_id ON reviews(bank_id);
 CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews(rating);
 CREATE INDEX IF NOT EXISTS idx_reviews_sentiment_label ON reviews(sentiment_label);
 CREATE INDEX IF NOT EXISTS idx_reviews_review_date ON reviews(review_date);
-CREATE INDEX IF NOT EXISTS idx_banks_bank_name ON banks(bank_name);
+
+-- One row per bank name, so bank inserts can upsert with ON CONFLICT (bank_name)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_banks_bank_name_unique ON banks(bank_name);
+DROP INDEX IF EXISTS idx_banks_bank_name;
+
+-- Databases loaded before the dedup index may hold duplicate reviews, which
+-- would make the unique index fail; remove them (keeping the oldest row)
+-- the first time the index is created
+DO $$
+BEGIN
+    IF to_regclass('idx_reviews_dedup') IS NULL THEN
+        DELETE FROM reviews a USING reviews b
+        WHERE a.review_id > b.review_id
+          AND a.bank_id = b.bank_id
+          AND md5(a.review_text) = md5(b.review_text)
+          AND a.review_date IS NOT DISTINCT FROM b.review_date;
+    END IF;
+END $$;
+
+-- One row per bank, review text and date; inserts use ON CONFLICT DO NOTHING
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_dedup
+    ON reviews(bank_id, md5(review_text), COALESCE(review_date, DATE '0001-01-01'));
 
 -- Insert Bank Data (if not exists)
 INSERT INTO banks (bank_name, app_name, description) 
@@ -5,9 +5,93 @@ Cleans and preprocesses scraped review data.
 
 import pandas as pd
 import numpy as np
-from datetime import datetime
 import os
+import warnings
 from typing import Optional
+from utils import CSV_ENGINE, COMPACT_DTYPES
+
+# Date formats accepted in the raw review exports
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y')
+
+# Candidate inputs, in order of preference
+RAW_INPUT_FILES = (
+    '../Data/all_banks_raw.parquet',
+    '../Data/all_banks_raw.csv',
+    '../Data/all_banks.csv'
+)
+
+# Columns kept from the raw data, in output order
+REVIEW_COLUMNS = ['review', 'rating', 'date', 'bank', 'source']
+
+# Known schema of the review CSV, so the parser skips type inference
+REVIEW_DTYPES = {
+    'review': 'string',
+    'rating': 'float32',
+    'bank': 'category',
+    'source': 'category'
+}
+
+
+def _select_date_format(date_string: str) -> Optional[str]:
+    """
+    Pick the single DATE_FORMATS entry matching a string's shape.
+    
+    All supported formats are 10 characters long and differ in where the
+    separator sits, so one format attempt is enough instead of up to five.
+    
+    Args:
+        date_string: Stripped date string
+    
+    Returns:
+        strptime format, or None if no known format fits
+    """
+    if len(date_string) != 10:
+        return None
+    if date_string[4] == '-':
+        return '%Y-%m-%d'
+    if date_string[4] == '/':
+        return '%Y/%m/%d'
+    if date_string[2] == '/':
+        # Day-first is preferred; a middle group above 12 can only be a day
+        middle = date_string[3:5]
+        if middle.isdigit() and int(middle) > 12:
+            return '%m/%d/%Y'
+        return '%d/%m/%Y'
+    if date_string[2] == '-':
+        return '%d-%m-%Y'
+    return None
+
+
+def _parse_date_strings(date_strings: pd.Series) -> pd.Series:
+    """
+    Parse date strings of mixed formats to YYYY-MM-DD without raising.
+    
+    Strings are grouped by their detected format and each group is parsed
+    with one coercing pd.to_datetime call, so failed matches become NaT
+    instead of raising ValueError row by row.
+    
+    Args:
+        date_strings: Series of raw date strings
+    
+    Returns:
+        Series of normalized date strings (missing where unparseable)
+    """
+    stripped = date_strings.astype('string').str.strip()
+    formats = stripped.map(_select_date_format, na_action='ignore')
+    parsed = pd.Series(pd.NaT, index=stripped.index, dtype='datetime64[ns]')
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for fmt, group in stripped.groupby(formats):
+            parsed[group.index] = pd.to_datetime(group, format=fmt, errors='coerce')
+        
+        unmatched = parsed.isna() & stripped.notna()
+        if unmatched.any():
+            parsed[unmatched] = pd.to_datetime(
+                stripped[unmatched], format='mixed', errors='coerce'
+            )
+    
+    return parsed.dt.strftime('%Y-%m-%d')
 
 
 class DataPreprocessor:
@@ -26,11 +110,12 @@ class DataPreprocessor:
     
     def load_data(self) -> pd.DataFrame:
         """Load data from input file."""
-        # Try to find input file
+        # Try to find input file, preferring the Parquet scrape output
         if not self.input_file:
-            input_file = '../Data/all_banks_raw.csv'
-            if not os.path.exists(input_file):
-                input_file = '../Data/all_banks.csv'
+            for input_file in RAW_INPUT_FILES:
+                if os.path.exists(input_file):
+                    break
+            if input_file == RAW_INPUT_FILES[-1]:
                 print(f"Raw file not found, using existing file: {input_file}")
         else:
             input_file = self.input_file
@@ -38,7 +123,17 @@ class DataPreprocessor:
         if not os.path.exists(input_file):
             raise FileNotFoundError(f"Input file not found: {input_file}. Please run task1_scraping.py first")
         
-        df = pd.read_csv(input_file)
+        if input_file.endswith('.parquet'):
+            df = pd.read_parquet(input_file, columns=REVIEW_COLUMNS).astype(REVIEW_DTYPES)
+        else:
+            df = pd.read_csv(
+                input_file,
+                engine=CSV_ENGINE,
+                usecols=REVIEW_COLUMNS,
+                # Dates stay strings here: the parser would read ambiguous
+                # ones month-first, normalize_dates parses them day-first
+                dtype={**REVIEW_DTYPES, 'date': 'string'}
+            )
         print(f"Loaded {len(df)} reviews from {input_file}")
         return df
     
@@ -53,7 +148,9 @@ class DataPreprocessor:
             DataFrame with duplicates removed
         """
         initial_count = len(df)
-        df = df.drop_duplicates(subset=['review', 'bank'], keep='first')
+        # A categorical bank hashes as a small int code rather than a string
+        df = df.astype({'bank': 'category'})
+        df = df.drop_duplicates(subset=['review', 'bank'], keep='first', ignore_index=True)
         removed = initial_count - len(df)
         print(f"Removed {removed} duplicate reviews")
         return df
@@ -69,19 +166,54 @@ class DataPreprocessor:
             DataFrame with missing data handled
         """
         initial_count = len(df)
-        
-        # Remove rows with missing review text
-        df = df.dropna(subset=['review'])
-        df = df[df['review'].str.strip() != '']
-        
-        # Fill missing ratings and validate
-        df['rating'] = df['rating'].fillna(0)
-        df = df[(df['rating'] >= 1) & (df['rating'] <= 5)]
+        df = df.loc[self._valid_row_mask(df)]
         
         removed = initial_count - len(df)
         print(f"Removed {removed} rows with missing/invalid data")
         return df
     
+    @staticmethod
+    def _valid_row_mask(df: pd.DataFrame) -> np.ndarray:
+        """
+        Mark rows with non-empty review text and a 1-5 rating.
+        
+        A plain loop over the raw object array beats the .str accessor here.
+        
+        Args:
+            df: DataFrame with reviews
+        
+        Returns:
+            Boolean array, True for rows to keep
+        """
+        reviews = df['review'].to_numpy()
+        has_text = np.fromiter(
+            (isinstance(v, str) and v.strip() != '' for v in reviews),
+            dtype=bool, count=len(reviews)
+        )
+        # NaN compares False, so missing ratings drop out without a fillna
+        ratings = df['rating'].to_numpy(dtype='float32', na_value=np.nan)
+        return has_text & (ratings >= 1.0) & (ratings <= 5.0)
+    
+    def _build_keep_mask(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Combine duplicate removal and missing-data filtering into one mask.
+        
+        Equivalent to remove_duplicates followed by handle_missing_data,
+        but lets the caller materialize the filtered frame only once.
+        
+        Args:
+            df: DataFrame with reviews
+        
+        Returns:
+            Boolean array, True for rows to keep
+        """
+        unique = ~df.duplicated(subset=['review', 'bank'], keep='first').to_numpy()
+        valid = self._valid_row_mask(df)
+        
+        print(f"Removed {int((~unique).sum())} duplicate reviews")
+        print(f"Removed {int((unique & ~valid).sum())} rows with missing/invalid data")
+        return unique & valid
+    
     def normalize_dates(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Normalize date formats to YYYY-MM-DD.
@@ -92,35 +224,37 @@ class DataPreprocessor:
         Returns:
             DataFrame with normalized dates
         """
-        def parse_date(date_value):
-            """Parse various date formats to YYYY-MM-DD."""
-            if pd.isna(date_value):
-                return None
-            
-            if isinstance(date_value, str):
-                try:
-                    for fmt in ['%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y']:
-                        try:
-                            dt = datetime.strptime(date_value, fmt)
-                            return dt.strftime('%Y-%m-%d')
-                        except ValueError:
-                            continue
-                    dt = pd.to_datetime(date_value, errors='coerce')
-                    if pd.notna(dt):
-                        return dt.strftime('%Y-%m-%d')
-                except:
-                    pass
-                return None
+        # Dates already parsed on load only need formatting
+        if pd.api.types.is_datetime64_any_dtype(df['date']):
+            df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+            print(f"Normalized {df['date'].notna().sum()} out of {len(df)} dates (already parsed)")
+            return df
+        
+        raw_dates = df['date'].astype('string')
+        
+        # Detect the dominant format on a small sample, then parse the whole
+        # column in one vectorized call instead of trying formats per row
+        sample = raw_dates.dropna().head(100)
+        best_format = max(
+            DATE_FORMATS,
+            key=lambda fmt: pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        )
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            parsed = pd.to_datetime(raw_dates, format=best_format, errors='coerce')
+            normalized = parsed.dt.strftime('%Y-%m-%d')
             
-            if isinstance(date_value, datetime) or pd.api.types.is_datetime64_any_dtype(type(date_value)):
-                try:
-                    return pd.to_datetime(date_value).strftime('%Y-%m-%d')
-                except:
-                    return None
-            
-            return None
-        
-        df['date'] = df['date'].apply(parse_date)
+            # Fall back to per-format parsing only for the leftovers, parsing
+            # each distinct string once and mapping the results back
+            remaining = parsed.isna() & raw_dates.notna()
+            if remaining.any():
+                leftovers = raw_dates[remaining]
+                unique_dates = pd.Series(leftovers.unique())
+                mapping = dict(zip(unique_dates, _parse_date_strings(unique_dates)))
+                normalized[remaining] = leftovers.map(mapping)
+        
+        df['date'] = normalized
         normalized_count = df['date'].notna().sum()
         print(f"Normalized {normalized_count} out of {len(df)} dates")
         return df
@@ -139,14 +273,16 @@ class DataPreprocessor:
         print("Data Quality Report")
         print("=" * 50)
         
+        # Categorical bank lets value_counts tally int codes, not strings
+        if not isinstance(df['bank'].dtype, pd.CategoricalDtype):
+            df['bank'] = df['bank'].astype('category')
+        
         total_rows = len(df)
         print(f"Total reviews: {total_rows}")
         
-        # Missing data check
-        missing_review = df['review'].isna().sum()
-        missing_rating = df['rating'].isna().sum()
-        missing_date = df['date'].isna().sum()
-        missing_bank = df['bank'].isna().sum()
+        # Missing data check (one pass over all checked columns)
+        missing = df[['review', 'rating', 'date', 'bank']].isna().sum()
+        missing_review, missing_rating, missing_date, missing_bank = missing.to_numpy()
         
         print(f"\nMissing data:")
         print(f"  Review text: {missing_review} ({missing_review/total_rows*100:.2f}%)")
@@ -190,23 +326,20 @@ class DataPreprocessor:
         
         df = self.load_data()
         
-        print("\n1. Removing duplicates...")
-        df = self.remove_duplicates(df)
+        print("\n1. Removing duplicates and missing data...")
+        df = df.loc[self._build_keep_mask(df)].reset_index(drop=True)
+        # Ratings are read as float32 to hold NaN; every survivor is 1-5
+        df = df.astype(COMPACT_DTYPES)
         
-        print("\n2. Handling missing data...")
-        df = self.handle_missing_data(df)
-        
-        print("\n3. Normalizing dates...")
+        print("\n2. Normalizing dates...")
         df = self.normalize_dates(df)
         
-        # Ensure correct column order
-        df = df[['review', 'rating', 'date', 'bank', 'source']]
-        
         # Validate data quality
         df = self.validate_data_quality(df)
         
-        # Save cleaned data
-        df.to_csv(self.output_file, index=False)
+        # Save cleaned data (column order is fixed here rather than by
+        # reprojecting the frame, since read order depends on the engine)
+        df.to_csv(self.output_file, columns=REVIEW_COLUMNS, index=False)
         print(f"Cleaned data saved to: {self.output_file}")
         
         return df
@@ -6,9 +6,12 @@ Scrapes reviews from Google Play Store for three Ethiopian banks.
 import pandas as pd
 from google_play_scraper import app, reviews, Sort
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from typing import List, Dict, Any
+from utils import COMPACT_DTYPES
+
+REVIEW_COLUMNS = ['review', 'rating', 'date', 'bank', 'source']
 
 
 class PlayStoreScraper:
@@ -32,9 +35,9 @@ class PlayStoreScraper:
         os.makedirs(output_dir, exist_ok=True)
     
     def scrape_reviews(self, app_id: str, bank_name: str, count: int = 400, 
-                      sort: Sort = Sort.NEWEST) -> List[Dict[str, Any]]:
+                      sort: Sort = Sort.NEWEST) -> int:
         """
-        Scrape reviews for a specific bank app.
+        Scrape reviews for a specific bank app into its JSONL buffer.
         
         Args:
             app_id: Google Play Store app ID or package name
@@ -43,10 +46,13 @@ class PlayStoreScraper:
             sort: Sort order
         
         Returns:
-            List of review dictionaries
+            Number of reviews written to the buffer (at most count)
         """
         print(f"Scraping reviews for {bank_name}...")
         
+        # Start a fresh buffer; every batch is persisted as soon as it arrives
+        self._reset_buffer(bank_name)
+        
         try:
             # Scrape reviews
             result, continuation_token = reviews(
@@ -56,10 +62,11 @@ class PlayStoreScraper:
                 sort=sort,
                 count=count
             )
+            self._append_to_buffer(result, bank_name)
             
-            # Continue scraping if needed
-            reviews_list = result
-            while len(reviews_list) < count and continuation_token:
+            # Continue scraping if needed; only a running count is kept in memory
+            scraped = len(result)
+            while scraped < count and continuation_token:
                 try:
                     result, continuation_token = reviews(
                         app_id,
@@ -67,19 +74,65 @@ class PlayStoreScraper:
                         lang='en',
                         country='et'
                     )
-                    reviews_list.extend(result)
+                    self._append_to_buffer(result, bank_name)
+                    scraped += len(result)
                     time.sleep(2)  # Rate limiting
                 except Exception as e:
                     print(f"Error continuing scrape for {bank_name}: {e}")
                     break
             
-            print(f"Successfully scraped {len(reviews_list)} reviews for {bank_name}")
-            return reviews_list[:count]
+            print(f"Successfully scraped {scraped} reviews for {bank_name}")
+            return min(scraped, count)
             
         except Exception as e:
             print(f"Error scraping {bank_name}: {e}")
             print(f"Trying alternative method...")
-            return self._try_alternative_scrape(app_id, bank_name, count, sort)
+            result = self._try_alternative_scrape(app_id, bank_name, count, sort)
+            # Drop batches already buffered so the retry does not duplicate them
+            self._reset_buffer(bank_name)
+            self._append_to_buffer(result, bank_name)
+            return min(len(result), count)
+    
+    def _buffer_path(self, bank_name: str) -> str:
+        """Return the path of the per-bank JSONL scrape buffer."""
+        return os.path.join(self.output_dir, f'{bank_name}_raw.jsonl')
+    
+    def _reset_buffer(self, bank_name: str):
+        """Create or truncate the bank's scrape buffer."""
+        open(self._buffer_path(bank_name), 'w').close()
+    
+    def _append_to_buffer(self, batch: List[Dict[str, Any]], bank_name: str):
+        """
+        Append a batch of scraped reviews, formatted, to the bank's buffer.
+        
+        Args:
+            batch: List of review dictionaries from scraper
+            bank_name: Name of the bank
+        """
+        if not batch:
+            return
+        lines = pd.DataFrame(self.format_reviews(batch, bank_name)).to_json(
+            orient='records', lines=True, force_ascii=False
+        )
+        with open(self._buffer_path(bank_name), 'a', encoding='utf-8') as f:
+            f.write(lines if lines.endswith('\n') else lines + '\n')
+    
+    def _load_buffer(self, bank_name: str, count: int) -> pd.DataFrame:
+        """
+        Bulk-load a bank's scrape buffer.
+        
+        Args:
+            bank_name: Name of the bank
+            count: Maximum number of reviews to keep
+        
+        Returns:
+            DataFrame with formatted reviews
+        """
+        buffer_path = self._buffer_path(bank_name)
+        if not os.path.exists(buffer_path) or os.path.getsize(buffer_path) == 0:
+            return pd.DataFrame(columns=REVIEW_COLUMNS)
+        df = pd.read_json(buffer_path, lines=True, dtype=False, convert_dates=False)
+        return df.head(count)
     
     def _try_alternative_scrape(self, app_id: str, bank_name: str, 
                                count: int, sort: Sort) -> List[Dict[str, Any]]:
@@ -100,28 +153,30 @@ class PlayStoreScraper:
             return []
     
     def format_reviews(self, reviews_list: List[Dict[str, Any]], 
-                      bank_name: str) -> List[Dict[str, Any]]:
+                      bank_name: str) -> Dict[str, List[Any]]:
         """
-        Format scraped reviews into standardized format.
+        Format scraped reviews into standardized columns.
         
         Args:
             reviews_list: List of review dictionaries from scraper
             bank_name: Name of the bank
         
         Returns:
-            List of formatted review dictionaries
-        """
-        formatted = []
-        for review in reviews_list:
-            formatted.append({
-                'review': review.get('content', ''),
-                'rating': review.get('score', 0),
-                'date': review.get('at', datetime.now()).strftime('%Y-%m-%d') 
-                       if review.get('at') else None,
-                'bank': bank_name,
-                'source': 'Google Play'
-            })
-        return formatted
+            Dictionary mapping column names to lists of values
+        """
+        count = len(reviews_list)
+        # Format all timestamps in one vectorized call rather than per review
+        review_times = pd.to_datetime(
+            pd.Series([review.get('at') for review in reviews_list], dtype=object),
+            errors='coerce'
+        )
+        return {
+            'review': [review.get('content', '') for review in reviews_list],
+            'rating': [review.get('score', 0) for review in reviews_list],
+            'date': review_times.dt.strftime('%Y-%m-%d').tolist(),
+            'bank': [bank_name] * count,
+            'source': ['Google Play'] * count
+        }
     
     def scrape_all_banks(self, count_per_bank: int = 400) -> pd.DataFrame:
         """
@@ -136,28 +191,38 @@ class PlayStoreScraper:
         print("Starting web scraping for bank reviews...")
         print("=" * 50)
         
-        all_reviews = []
-        
-        for bank_name, app_id in self.BANK_APPS.items():
-            reviews_list = self.scrape_reviews(app_id, bank_name, count=count_per_bank)
-            formatted_reviews = self.format_reviews(reviews_list, bank_name)
-            all_reviews.extend(formatted_reviews)
-            print(f"Total reviews collected so far: {len(all_reviews)}")
-            time.sleep(3)  # Rate limiting between banks
+        # Scraping is network-bound, so the banks are fetched concurrently;
+        # per-bank rate limiting still happens inside scrape_reviews
+        with ThreadPoolExecutor(max_workers=len(self.BANK_APPS)) as executor:
+            futures = {
+                executor.submit(self.scrape_reviews, app_id, bank_name, count_per_bank): bank_name
+                for bank_name, app_id in self.BANK_APPS.items()
+            }
+            for future in as_completed(futures):
+                print(f"Finished {futures[future]}: {future.result()} reviews")
         
-        df = pd.DataFrame(all_reviews)
+        # Reviews were streamed to per-bank buffers; bulk-load them in a
+        # stable bank order regardless of completion order
+        df = pd.concat(
+            [self._load_buffer(bank_name, count_per_bank) for bank_name in self.BANK_APPS],
+            ignore_index=True
+        )
+        df = df[REVIEW_COLUMNS].astype(COMPACT_DTYPES)
         return df
     
-    def save_results(self, df: pd.DataFrame, filename: str = 'all_banks_raw.csv'):
+    def save_results(self, df: pd.DataFrame, filename: str = 'all_banks_raw.parquet'):
         """
-        Save scraped data to CSV.
+        Save scraped data to Parquet (or CSV if filename ends with .csv).
         
         Args:
             df: DataFrame to save
             filename: Output filename
         """
         output_file = os.path.join(self.output_dir, filename)
-        df.to_csv(output_file, index=False)
+        if filename.endswith('.csv'):
+            df.to_csv(output_file, index=False)
+        else:
+            df.to_parquet(output_file, compression='snappy', index=False)
         
         print("=" * 50)
         print(f"Scraping complete!")
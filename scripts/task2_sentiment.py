@@ -5,15 +5,93 @@ Analyzes sentiment of reviews using distilbert or VADER.
 
 import pandas as pd
 import numpy as np
-from transformers import pipeline
+import pyarrow as pa
+import pyarrow.parquet as pq
+from transformers import pipeline, AutoTokenizer
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import os
+import contextlib
 import warnings
-from utils import TextProcessor
-from typing import Tuple, Optional
+from multiprocessing import Pool, get_all_start_methods
+from utils import TextProcessor, REVIEW_FILE_DTYPES
+from typing import Tuple, Optional, List, Dict, Any
 
 warnings.filterwarnings('ignore')
 
+try:
+    import torch
+except ImportError:
+    torch = None
+
+# Try to import ONNX Runtime support for the quantized model
+try:
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    USE_ONNX = True
+except ImportError:
+    USE_ONNX = False
+
+DISTILBERT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+QUANTIZED_MODEL_DIR = '../models/distilbert-sst2-int8'
+
+# Columns read from the cleaned review CSV
+INPUT_COLUMNS = ['review', 'rating', 'date', 'bank', 'source']
+
+# Fixed dtypes for the chunked CSV read, so a chunk with missing values
+# cannot infer different types than the first one the Parquet schema came
+# from; nullable Int8 ratings tolerate blanks and still write as integers
+INPUT_DTYPES = {
+    'review': str,
+    'date': str,
+    **{column: dtype for column, dtype in REVIEW_FILE_DTYPES.items() if column in INPUT_COLUMNS},
+    'rating': 'Int8'
+}
+
+# Below this many reviews, process start-up costs more than it saves.
+# VADER takes ~30us per review; a forked pool starts in ~30ms, but spawned
+# workers re-import this module (pandas, transformers, torch) and take
+# seconds, which two workers only win back past a few hundred thousand
+# reviews. Override with the SENTIMENT_PARALLEL_MIN_REVIEWS variable.
+PARALLEL_MIN_REVIEWS = int(os.environ.get(
+    'SENTIMENT_PARALLEL_MIN_REVIEWS',
+    5_000 if get_all_start_methods()[0] == 'fork' else 250_000
+))
+
+# Very common one- and two-word reviews, scored once when the analyzer starts
+COMMON_SHORT_REVIEWS = (
+    'good', 'ok', 'okay', 'nice', 'great', 'best', 'bad', 'poor', 'worst',
+    'excellent', 'amazing', 'awesome', 'perfect', 'cool', 'fine', 'love it',
+    'wow', 'thanks', 'thank you', 'useless', 'terrible', 'fantastic', 'super',
+    'very good', 'good app', 'nice app', 'best app', 'great app', 'bad app'
+)
+
+# Reviews scored and written per chunk, bounding peak memory
+CHUNK_SIZE = 10_000
+
+# Fixed label categories, so every chunk shares one dictionary-encoded schema
+SENTIMENT_LABEL_DTYPE = pd.CategoricalDtype(['negative', 'neutral', 'positive'])
+
+# Columns kept in memory for the summary once a chunk has been written
+SUMMARY_COLUMNS = ['bank', 'rating', 'sentiment_label', 'sentiment_score']
+
+# Per-process VADER analyzer, built once by each pool worker's initializer
+_worker_vader = None
+
+
+def _init_vader_worker():
+    """Create the VADER analyzer a pool worker reuses for all its texts."""
+    global _worker_vader
+    _worker_vader = SentimentIntensityAnalyzer()
+
+
+def _worker_vader_compound(text: str) -> float:
+    """Return the VADER compound score for a cleaned text in a pool worker."""
+    try:
+        return _worker_vader.polarity_scores(text)['compound']
+    except Exception as e:
+        print(f"Error in VADER analysis: {e}")
+        return 0.0
+
 
 class SentimentAnalyzer:
     """Handles sentiment analysis of reviews."""
@@ -28,20 +106,55 @@ class SentimentAnalyzer:
         self.text_processor = TextProcessor()
         self.vader_analyzer = SentimentIntensityAnalyzer()
         self.use_distilbert = False
+        self.use_bf16 = False
+        # Pipeline device: CUDA device index, or -1 for CPU
+        self.device = -1
         self.sentiment_pipeline = None
+        # Results keyed by cleaned review text
+        self._cache: Dict[str, Tuple[str, float]] = {}
         
         if use_distilbert:
             self._load_distilbert()
+        self._fast = self._build_fast_path()
+    
+    def _build_fast_path(self) -> Dict[str, Tuple[str, float]]:
+        """
+        Score COMMON_SHORT_REVIEWS with the active model.
+        
+        analyze() answers these with a dict lookup, before cleaning the
+        text or consulting the cache.
+        
+        Returns:
+            Dictionary mapping short review text to (label, score)
+        """
+        texts = list(COMMON_SHORT_REVIEWS)
+        if self.use_distilbert:
+            results = self.analyze_batch_with_distilbert(texts)
+        else:
+            results = [self.analyze_with_vader(text) for text in texts]
+        return dict(zip(texts, results))
     
     def _load_distilbert(self):
         """Try to load distilbert model."""
         try:
             print("Loading distilbert sentiment model...")
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis",
-                model="distilbert-base-uncased-finetuned-sst-2-english",
-                device=-1
-            )
+            self.sentiment_pipeline = None
+            use_gpu = torch is not None and torch.cuda.is_available()
+            # The quantized ONNX model is a CPU optimization; a GPU is faster
+            if USE_ONNX and not use_gpu:
+                self.sentiment_pipeline = self._load_quantized_distilbert()
+            if self.sentiment_pipeline is None:
+                self.device = 0 if use_gpu else -1
+                self.sentiment_pipeline = pipeline(
+                    "sentiment-analysis",
+                    model=DISTILBERT_MODEL,
+                    device=self.device,
+                    # Half precision halves GPU memory per token
+                    torch_dtype=torch.float16 if use_gpu else None
+                )
+                if use_gpu:
+                    print("✓ Running distilbert on GPU in float16")
+                self._optimize_torch_model()
             self.use_distilbert = True
             print("✓ Distilbert model loaded successfully")
         except Exception as e:
@@ -49,6 +162,85 @@ class SentimentAnalyzer:
             print("Falling back to VADER sentiment analyzer")
             self.use_distilbert = False
     
+    def _optimize_torch_model(self):
+        """
+        Compile the PyTorch model and enable bfloat16 autocast if supported.
+        
+        bfloat16 is only turned on when running on a CPU with native
+        support, since emulated bfloat16 is slower than float32.
+        """
+        if torch is None:
+            return
+        
+        try:
+            # CPU autocast only; on GPU the model already runs in float16
+            self.use_bf16 = (self.device < 0
+                             and torch.backends.mkldnn.is_available()
+                             and torch.ops.mkldnn._is_mkldnn_bf16_supported())
+        except Exception as e:
+            self.use_bf16 = False
+            print(f"Could not enable bfloat16 autocast: {e}")
+        
+        if not hasattr(torch, 'compile'):
+            return
+        
+        eager_model = self.sentiment_pipeline.model
+        try:
+            # Review lengths vary, so avoid recompiling per sequence length
+            self.sentiment_pipeline.model = torch.compile(eager_model, dynamic=True)
+            # Compilation is lazy; warm up so failures surface here rather
+            # than as a silent VADER fallback on the first batch
+            with self._inference_context():
+                self.sentiment_pipeline(["warm-up"], truncation=True)
+        except Exception as e:
+            self.sentiment_pipeline.model = eager_model
+            print(f"Could not compile distilbert model, running eagerly: {e}")
+    
+    def _inference_context(self):
+        """Return the context manager wrapping distilbert forward passes."""
+        if torch is None:
+            return contextlib.nullcontext()
+        
+        stack = contextlib.ExitStack()
+        stack.enter_context(torch.inference_mode())
+        if self.use_bf16:
+            stack.enter_context(torch.autocast('cpu', dtype=torch.bfloat16))
+        return stack
+    
+    def _load_quantized_distilbert(self):
+        """
+        Build a distilbert pipeline on an INT8-quantized ONNX Runtime model.
+        
+        The model is exported and dynamically quantized on first use, then
+        reused from QUANTIZED_MODEL_DIR on later runs.
+        
+        Returns:
+            Sentiment pipeline, or None if the ONNX path is unavailable
+        """
+        try:
+            model_file = os.path.join(QUANTIZED_MODEL_DIR, 'model_quantized.onnx')
+            if not os.path.exists(model_file):
+                print("Exporting and quantizing distilbert to ONNX (first run only)...")
+                onnx_model = ORTModelForSequenceClassification.from_pretrained(
+                    DISTILBERT_MODEL, export=True
+                )
+                quantizer = ORTQuantizer.from_pretrained(onnx_model)
+                quantization_config = AutoQuantizationConfig.avx512_vnni(
+                    is_static=False, per_channel=False
+                )
+                quantizer.quantize(save_dir=QUANTIZED_MODEL_DIR,
+                                   quantization_config=quantization_config)
+            
+            model = ORTModelForSequenceClassification.from_pretrained(
+                QUANTIZED_MODEL_DIR, file_name='model_quantized.onnx'
+            )
+            tokenizer = AutoTokenizer.from_pretrained(DISTILBERT_MODEL)
+            print("✓ Using INT8-quantized ONNX Runtime model")
+            return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+        except Exception as e:
+            print(f"Could not load quantized ONNX model: {e}")
+            return None
+    
     def analyze_with_distilbert(self, text: str) -> Tuple[str, float]:
         """
         Analyze sentiment using distilbert model.
@@ -60,24 +252,65 @@ class SentimentAnalyzer:
             Tuple of (label, score)
         """
         try:
-            max_length = 512
-            if len(text) > max_length:
-                text = text[:max_length]
-            
-            result = self.sentiment_pipeline(text)[0]
-            label = result['label'].upper()
-            score = result['score']
-            
-            if label == 'POSITIVE':
-                return 'positive', score
-            elif label == 'NEGATIVE':
-                return 'negative', score
-            else:
-                return 'neutral', score
+            # Truncate by tokens (the model limit), not by characters
+            with self._inference_context():
+                result = self.sentiment_pipeline(text, truncation=True, max_length=512)[0]
+            return self._map_distilbert_result(result)
         except Exception as e:
             print(f"Error in distilbert analysis: {e}")
             return self.analyze_with_vader(text)
     
+    def analyze_batch_with_distilbert(self, texts: List[str],
+                                      batch_size: int = 64) -> List[Tuple[str, float]]:
+        """
+        Analyze sentiment for many texts using batched distilbert inference.
+        
+        Texts are run in order of token length so each batch pads to a
+        similar length, then results are put back in input order.
+        
+        Args:
+            texts: Cleaned review texts
+            batch_size: Number of texts per forward pass
+        
+        Returns:
+            List of (label, score) tuples, in input order
+        """
+        if not texts:
+            return []
+        
+        try:
+            lengths = self.sentiment_pipeline.tokenizer(
+                texts, truncation=True, max_length=512, return_length=True
+            )['length']
+            order = np.argsort(lengths, kind='stable')
+            
+            with self._inference_context():
+                predictions = self.sentiment_pipeline(
+                    [texts[i] for i in order],
+                    batch_size=batch_size, truncation=True, max_length=512
+                )
+            
+            results = [None] * len(texts)
+            for i, result in zip(order, predictions):
+                results[i] = self._map_distilbert_result(result)
+            return results
+        except Exception as e:
+            print(f"Error in batched distilbert analysis: {e}")
+            return [self.analyze_with_vader(text) for text in texts]
+    
+    @staticmethod
+    def _map_distilbert_result(result: Dict[str, Any]) -> Tuple[str, float]:
+        """Map a distilbert pipeline result to a (label, score) tuple."""
+        label = result['label'].upper()
+        score = result['score']
+        
+        if label == 'POSITIVE':
+            return 'positive', score
+        elif label == 'NEGATIVE':
+            return 'negative', score
+        else:
+            return 'neutral', score
+    
     def analyze_with_vader(self, text: str) -> Tuple[str, float]:
         """
         Analyze sentiment using VADER.
@@ -102,6 +335,54 @@ class SentimentAnalyzer:
             print(f"Error in VADER analysis: {e}")
             return 'neutral', 0.0
     
+    def _vader_compound(self, text: str) -> float:
+        """Return the VADER compound score for a cleaned text."""
+        try:
+            return self.vader_analyzer.polarity_scores(text)['compound']
+        except Exception as e:
+            print(f"Error in VADER analysis: {e}")
+            return 0.0
+    
+    def _score_with_vader(self, texts: List[str]) -> np.ndarray:
+        """
+        Compute VADER compound scores for many cleaned texts.
+        
+        Args:
+            texts: Cleaned review texts
+        
+        Returns:
+            Array of compound scores, in input order
+        """
+        total = len(texts)
+        workers = os.cpu_count() or 1
+        if workers > 1 and total >= PARALLEL_MIN_REVIEWS:
+            # VADER is pure Python and stateless per review, so spread it
+            # across processes; each worker builds its own analyzer once
+            # instead of receiving a pickled copy of this one per task
+            print(f"Scoring {total} reviews with VADER on {workers} processes...")
+            with Pool(workers, initializer=_init_vader_worker) as pool:
+                compounds = pool.map(_worker_vader_compound, texts, chunksize=512)
+            return np.asarray(compounds, dtype=float)
+        return np.fromiter((self._vader_compound(text) for text in texts), dtype=float, count=total)
+    
+    @staticmethod
+    def classify_compounds(compounds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Turn VADER compound scores into labels and scores in one pass.
+        
+        Uses the same thresholds as analyze_with_vader.
+        
+        Args:
+            compounds: Array of compound scores
+        
+        Returns:
+            Tuple of (labels, scores) arrays
+        """
+        labels = np.where(compounds >= 0.05, 'positive',
+                          np.where(compounds <= -0.05, 'negative', 'neutral'))
+        scores = np.where(labels == 'positive', compounds, np.abs(compounds))
+        return labels, scores
+    
     def analyze(self, text: str) -> Tuple[str, float]:
         """
         Main sentiment analysis function.
@@ -115,14 +396,25 @@ class SentimentAnalyzer:
         if not text or pd.isna(text) or str(text).strip() == '':
             return 'neutral', 0.0
         
+        fast = self._fast.get(str(text).strip().lower())
+        if fast is not None:
+            return fast
+        
         cleaned_text = self.text_processor.clean_text(str(text))
         if not cleaned_text:
             return 'neutral', 0.0
         
+        # Short, repeated reviews ("good app", "nice") are very common
+        cached = self._cache.get(cleaned_text)
+        if cached is not None:
+            return cached
+        
         if self.use_distilbert:
-            return self.analyze_with_distilbert(cleaned_text)
+            result = self.analyze_with_distilbert(cleaned_text)
         else:
-            return self.analyze_with_vader(cleaned_text)
+            result = self.analyze_with_vader(cleaned_text)
+        self._cache[cleaned_text] = result
+        return result
     
     def analyze_dataframe(self, df: pd.DataFrame, review_column: str = 'review') -> pd.DataFrame:
         """
@@ -138,24 +430,37 @@ class SentimentAnalyzer:
         print("\nAnalyzing sentiment for all reviews...")
         print("This may take a while...")
         
-        results = []
-        total = len(df)
+        # Score each distinct review once; missing reviews get code -1
+        codes, unique_reviews = pd.factorize(df[review_column])
+        texts = list(unique_reviews)
+        total = len(texts)
+        print(f"{total} distinct reviews out of {len(df)}")
+        cleaned = self.text_processor.clean_series(pd.Series(texts, dtype=object)).tolist()
         
-        for idx, row in df.iterrows():
-            if (idx + 1) % 100 == 0:
-                print(f"Processed {idx + 1}/{total} reviews...")
-            
-            label, score = self.analyze(row[review_column])
-            results.append({
-                'review_id': idx,
-                'sentiment_label': label,
-                'sentiment_score': score
-            })
-        
-        sentiment_df = pd.DataFrame(results)
-        df = df.reset_index().rename(columns={'index': 'review_id'})
-        df = pd.merge(df, sentiment_df, on='review_id', how='left')
-        df = df.drop('review_id', axis=1)
+        if self.use_distilbert:
+            # Batched inference; empty and common short reviews skip the model
+            unique_results = [('neutral', 0.0)] * total
+            to_score = []
+            for i, text in enumerate(cleaned):
+                if text in self._fast:
+                    unique_results[i] = self._fast[text]
+                elif text:
+                    to_score.append(i)
+            predictions = self.analyze_batch_with_distilbert([cleaned[i] for i in to_score])
+            for i, prediction in zip(to_score, predictions):
+                unique_results[i] = prediction
+                self._cache[cleaned[i]] = prediction
+            labels = np.array([label for label, _ in unique_results], dtype=object)
+            scores = np.array([score for _, score in unique_results], dtype=float)
+        else:
+            # Empty texts score a compound of 0.0, i.e. neutral with score 0.0
+            labels, scores = self.classify_compounds(self._score_with_vader(cleaned))
+        print(f"Processed {total}/{total} reviews...")
+        
+        # Missing reviews (code -1) pick up the trailing neutral entry
+        df = df.copy()
+        df['sentiment_label'] = np.append(labels, 'neutral')[codes]
+        df['sentiment_score'] = np.append(scores, 0.0)[codes]
         
         return df
     
@@ -177,23 +482,33 @@ class SentimentAnalyzer:
             print("No sentiment data available")
             return df
         
-        # Overall sentiment by bank
+        has_scores = 'sentiment_score' in df.columns
+        
+        # Overall sentiment by bank (one grouped pass instead of a filter per bank)
         print("\nSentiment distribution by bank:")
+        by_bank = df.groupby('bank', sort=False, observed=True)
+        bank_counts = by_bank['sentiment_label'].value_counts()
+        bank_means = by_bank['sentiment_score'].mean() if has_scores else None
         for bank in df['bank'].unique():
-            bank_df = df[df['bank'] == bank]
             print(f"\n{bank}:")
-            print(bank_df['sentiment_label'].value_counts())
-            if 'sentiment_score' in bank_df.columns:
-                print(f"Mean sentiment score: {bank_df['sentiment_score'].mean():.3f}")
+            # Missing banks and banks without labels have no group rows
+            if bank in bank_counts.index:
+                print(bank_counts.loc[bank])
+            else:
+                print(bank_counts.iloc[:0])
+            if has_scores:
+                print(f"Mean sentiment score: {bank_means.get(bank, np.nan):.3f}")
         
         # Sentiment by rating
         print("\n\nSentiment distribution by rating:")
-        for rating in sorted(df['rating'].unique()):
-            rating_df = df[df['rating'] == rating]
+        by_rating = df.groupby('rating', observed=True)
+        rating_counts = by_rating['sentiment_label'].value_counts()
+        rating_means = by_rating['sentiment_score'].mean() if has_scores else None
+        for rating in rating_counts.index.unique(level=0):
             print(f"\nRating {rating}:")
-            print(rating_df['sentiment_label'].value_counts())
-            if 'sentiment_score' in rating_df.columns:
-                print(f"Mean sentiment score: {rating_df['sentiment_score'].mean():.3f}")
+            print(rating_counts.loc[rating])
+            if has_scores:
+                print(f"Mean sentiment score: {rating_means[rating]:.3f}")
         
         # Cross-tabulation
         print("\n\nCross-tabulation: Bank vs Sentiment")
@@ -230,24 +545,31 @@ class SentimentAnalysisPipeline:
     """Complete pipeline for sentiment analysis."""
     
     def __init__(self, input_file: str = '../Data/all_banks.csv',
-                 output_file: str = '../Data/all_banks_with_sentiment.csv'):
+                 output_file: str = '../Data/all_banks_with_sentiment.parquet'):
         """
         Initialize the pipeline.
         
         Args:
             input_file: Path to input CSV
-            output_file: Path to output CSV
+            output_file: Path to output Parquet file (or CSV if it ends with .csv)
         """
         self.input_file = input_file
         self.output_file = output_file
         self.analyzer = SentimentAnalyzer()
     
-    def run(self) -> pd.DataFrame:
+    def run(self, chunksize: int = CHUNK_SIZE) -> pd.DataFrame:
         """
         Run the complete sentiment analysis pipeline.
         
+        Reviews are read, scored and appended to the output file one chunk
+        at a time; only SUMMARY_COLUMNS are kept for the statistics, so
+        memory stays bounded. Read output_file for the full scored reviews.
+        
+        Args:
+            chunksize: Number of reviews per chunk
+        
         Returns:
-            DataFrame with sentiment analysis results
+            DataFrame with bank, rating and sentiment results
         """
         print("Starting sentiment analysis...")
         print("=" * 50)
@@ -255,11 +577,48 @@ class SentimentAnalysisPipeline:
         if not os.path.exists(self.input_file):
             raise FileNotFoundError(f"Input file not found: {self.input_file}. Please run task1_preprocessing.py first")
         
-        df = pd.read_csv(self.input_file)
-        print(f"Loaded {len(df)} reviews from {self.input_file}")
+        output_columns = INPUT_COLUMNS + ['sentiment_label', 'sentiment_score']
+        summaries = []
+        writer = None
         
-        # Analyze sentiment
-        df = self.analyzer.analyze_dataframe(df)
+        # The pyarrow engine cannot read in chunks, so this uses the C parser
+        reader = pd.read_csv(self.input_file, usecols=INPUT_COLUMNS, dtype=INPUT_DTYPES, chunksize=chunksize)
+        try:
+            for chunk_number, chunk in enumerate(reader):
+                chunk = self.analyzer.analyze_dataframe(chunk)
+                if self.output_file.endswith('.csv'):
+                    chunk.to_csv(
+                        self.output_file,
+                        columns=output_columns,
+                        mode='w' if chunk_number == 0 else 'a',
+                        header=chunk_number == 0,
+                        index=False
+                    )
+                else:
+                    table = pa.Table.from_pandas(
+                        chunk[output_columns].astype({'sentiment_label': SENTIMENT_LABEL_DTYPE}),
+                        schema=writer.schema if writer is not None else None,
+                        preserve_index=False
+                    )
+                    if writer is None:
+                        writer = pq.ParquetWriter(self.output_file, table.schema, compression='snappy')
+                    writer.write_table(table)
+                summaries.append(chunk[SUMMARY_COLUMNS].astype({
+                    'bank': 'category',
+                    'sentiment_label': SENTIMENT_LABEL_DTYPE,
+                    'sentiment_score': 'float32'
+                }))
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        if not summaries:
+            raise ValueError(f"No reviews found in {self.input_file}")
+        
+        # Chunks can hold different bank categories, which concat would
+        # widen to plain strings
+        df = pd.concat(summaries, ignore_index=True).astype({'bank': 'category'})
+        print(f"\nAnalyzed {len(df)} reviews from {self.input_file}")
         
         # Aggregate statistics
         df = self.analyzer.aggregate_statistics(df)
@@ -267,8 +626,6 @@ class SentimentAnalysisPipeline:
         # Check KPI
         self.analyzer.check_kpi(df)
         
-        # Save results
-        df.to_csv(self.output_file, index=False)
         print(f"\nResults saved to: {self.output_file}")
         
         return df
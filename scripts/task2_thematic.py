@@ -5,23 +5,53 @@ Extracts keywords and clusters them into themes for each bank.
 
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+import joblib
+from joblib import Parallel, delayed
 import re
 import os
-from collections import Counter
+import hashlib
 import warnings
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional, Pattern
+from utils import read_reviews, WHITESPACE_PATTERN
 
 warnings.filterwarnings('ignore')
 
 # Try to import spacy
 try:
     import spacy
-    nlp = spacy.load("en_core_web_sm")
+    # Only the tokenizer, tagger and lemmatizer are needed for keyword prep
+    nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
     USE_SPACY = True
 except:
     USE_SPACY = False
 
+# Try to import pyahocorasick for single-pass keyword matching
+try:
+    import ahocorasick
+    USE_AHOCORASICK = True
+except ImportError:
+    USE_AHOCORASICK = False
+
+# Compiled once; applied to whole review columns rather than row by row
+NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9\s]')
+
+# Tokenizing takes roughly 10us per review, so process start-up (around a
+# second) only pays off for large corpora
+PARALLEL_MIN_REVIEWS = 100_000
+# Vectorized preprocessing is far cheaper (about 1.5us per review)
+PARALLEL_PREPROCESS_MIN_REVIEWS = 1_000_000
+
+
+def _analyze_documents(analyzer, documents: List[str]) -> List[List[str]]:
+    """Run a vectorizer analyzer over documents (in a joblib worker)."""
+    return [analyzer(document) for document in documents]
+
+
+def _pretokenized(tokens: List[str]) -> List[str]:
+    """Analyzer for documents that were already tokenized."""
+    return tokens
+
 
 class TextPreprocessor:
     """Handles text preprocessing for thematic analysis."""
@@ -41,57 +71,253 @@ class TextPreprocessor:
             return ""
         
         text = str(text).lower()
-        text = re.sub(r'[^a-z0-9\s]', ' ', text)
+        text = NON_ALNUM_PATTERN.sub(' ', text)
         text = ' '.join(text.split())
         return text
+    
+    @staticmethod
+    def preprocess_series(texts: pd.Series) -> pd.Series:
+        """
+        Preprocess a whole column of texts with vectorized string methods.
+        
+        Same output as applying preprocess() to each element.
+        
+        Args:
+            texts: Series of raw review texts
+        
+        Returns:
+            Series of preprocessed texts
+        """
+        texts = texts.where(texts.notna(), '').astype(str)
+        processed = (
+            texts.str.lower()
+            .str.replace(NON_ALNUM_PATTERN.pattern, ' ', regex=True)
+            .str.replace(WHITESPACE_PATTERN.pattern, ' ', regex=True)
+            .str.strip()
+        )
+        
+        # Arrow lowercases some non-ASCII characters differently from
+        # str.lower (e.g. dotted capital I), so those rows take the slow path
+        non_ascii = texts.str.contains(r'[^\x00-\x7f]', regex=True)
+        if non_ascii.any():
+            processed[non_ascii] = texts[non_ascii].map(TextPreprocessor.preprocess)
+        return processed
+    
+    @staticmethod
+    def preprocess_parallel(texts: pd.Series, n_workers: Optional[int] = None) -> pd.Series:
+        """
+        Preprocess a very large column in contiguous chunks across processes.
+        
+        Same output as preprocess_series, which is used directly for inputs
+        below PARALLEL_PREPROCESS_MIN_REVIEWS or on a single CPU.
+        
+        Args:
+            texts: Series of raw review texts
+            n_workers: Worker processes (defaults to the CPU count)
+        
+        Returns:
+            Series of preprocessed texts
+        """
+        n_workers = n_workers or os.cpu_count() or 1
+        if n_workers < 2 or len(texts) < PARALLEL_PREPROCESS_MIN_REVIEWS:
+            return TextPreprocessor.preprocess_series(texts)
+        
+        bounds = np.linspace(0, len(texts), n_workers + 1).astype(int)
+        chunks = Parallel(n_jobs=n_workers)(
+            delayed(TextPreprocessor.preprocess_series)(texts.iloc[start:end])
+            for start, end in zip(bounds[:-1], bounds[1:])
+        )
+        return pd.concat(chunks)
+    
+    @staticmethod
+    def lemmatize(texts: List[str], batch_size: int = 256,
+                  n_process: Optional[int] = None) -> List[str]:
+        """
+        Lemmatize texts with spaCy, streaming them through nlp.pipe.
+        
+        Returns the texts unchanged when spaCy is not available.
+        
+        Args:
+            texts: Preprocessed texts
+            batch_size: Number of texts spaCy processes per batch
+            n_process: Worker processes (defaults to the CPU count)
+        
+        Returns:
+            List of lemmatized texts
+        """
+        if not USE_SPACY:
+            return list(texts)
+        
+        n_process = n_process or os.cpu_count() or 1
+        docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+        return [' '.join(token.lemma_ for token in doc) for doc in docs]
 
 
 class KeywordExtractor:
     """Extracts keywords using TF-IDF."""
     
-    def __init__(self, max_features: int = 50, ngram_range: Tuple[int, int] = (1, 2)):
+    def __init__(self, max_features: int = 50, ngram_range: Tuple[int, int] = (1, 2),
+                 min_df: int = 2, max_df: float = 0.95, lemmatize: bool = False,
+                 cache_dir: Optional[str] = None):
         """
         Initialize the keyword extractor.
         
         Args:
             max_features: Maximum number of features to extract
             ngram_range: Range of n-grams to consider
+            min_df: Minimum number of reviews a term must appear in
+            max_df: Maximum fraction of reviews a term may appear in
+            lemmatize: Lemmatize reviews with spaCy before counting terms
+            cache_dir: Directory where fit() stores term counts keyed by a
+                hash of the corpus, so refitting an unchanged corpus loads
+                them instead of tokenizing again (disabled if None)
         """
         self.max_features = max_features
         self.ngram_range = ngram_range
+        self.min_df = min_df
+        self.max_df = max_df
+        self.lemmatize = lemmatize
+        self.cache_dir = cache_dir
         self.preprocessor = TextPreprocessor()
+        # Built once and refitted per corpus; pruning happens in _rank_keywords
+        self.vectorizer = CountVectorizer(ngram_range=ngram_range, stop_words='english')
+        self._counts = None
+        self._feature_names = None
+    
+    def _count_terms(self, reviews: List[str], preprocessed: bool = False) -> Tuple[Any, np.ndarray]:
+        """Tokenize reviews into a CSR term-count matrix and its feature names."""
+        if preprocessed:
+            processed_reviews = reviews
+        else:
+            processed_reviews = self.preprocessor.preprocess_series(pd.Series(reviews)).tolist()
+        if self.lemmatize:
+            processed_reviews = self.preprocessor.lemmatize(processed_reviews)
+        
+        workers = os.cpu_count() or 1
+        if workers > 1 and len(processed_reviews) >= PARALLEL_MIN_REVIEWS:
+            # Tokenizing and building n-grams is the expensive part of the
+            # fit, so spread it across processes in contiguous, in-order
+            # chunks; counting the tokens afterwards gives the same matrix
+            analyzer = self.vectorizer.build_analyzer()
+            bounds = np.linspace(0, len(processed_reviews), workers + 1).astype(int)
+            token_chunks = Parallel(n_jobs=workers)(
+                delayed(_analyze_documents)(analyzer, processed_reviews[start:end])
+                for start, end in zip(bounds[:-1], bounds[1:])
+            )
+            vectorizer = CountVectorizer(analyzer=_pretokenized)
+            documents = [tokens for chunk in token_chunks for tokens in chunk]
+            counts = vectorizer.fit_transform(documents).tocsr()
+            return counts, vectorizer.get_feature_names_out()
+        
+        counts = self.vectorizer.fit_transform(processed_reviews).tocsr()
+        return counts, self.vectorizer.get_feature_names_out()
+    
+    def fit(self, reviews: List[str], preprocessed: bool = False):
+        """
+        Tokenize the full corpus once so per-bank extraction only slices it.
+        
+        Args:
+            reviews: List of all review texts
+            preprocessed: Whether reviews already went through TextPreprocessor
+        """
+        if not self.cache_dir:
+            self._counts, self._feature_names = self._count_terms(reviews, preprocessed)
+            return
+        
+        if not preprocessed:
+            reviews = self.preprocessor.preprocess_series(pd.Series(reviews)).tolist()
+        cache_file = os.path.join(self.cache_dir, f"{self._corpus_key(reviews)}.joblib")
+        if os.path.exists(cache_file):
+            self._counts, self._feature_names = joblib.load(cache_file)
+            print(f"  Loaded cached term counts from {cache_file}")
+            return
+        
+        self._counts, self._feature_names = self._count_terms(reviews, preprocessed=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        joblib.dump((self._counts, self._feature_names), cache_file)
+    
+    def _corpus_key(self, processed_reviews: List[str]) -> str:
+        """
+        Hash a preprocessed corpus together with the tokenization settings.
+        
+        Args:
+            processed_reviews: Preprocessed review texts
+        
+        Returns:
+            Hex digest identifying the term counts fit() would produce
+        """
+        digest = hashlib.sha1(repr((self.ngram_range, self.lemmatize)).encode())
+        # Preprocessed reviews never contain newlines, so joining is unambiguous
+        digest.update('\n'.join(processed_reviews).encode())
+        return digest.hexdigest()
     
-    def extract(self, reviews: List[str]) -> List[Tuple[str, float]]:
+    def extract(self, reviews: List[str], preprocessed: bool = False) -> List[Tuple[str, float]]:
         """
         Extract keywords using TF-IDF.
         
         Args:
             reviews: List of review texts
+            preprocessed: Whether reviews already went through TextPreprocessor
         
         Returns:
             List of (keyword, score) tuples
         """
-        processed_reviews = [self.preprocessor.preprocess(review) for review in reviews]
+        try:
+            counts, feature_names = self._count_terms(reviews, preprocessed)
+            return self._rank_keywords(counts, feature_names)
+        except Exception as e:
+            print(f"Error in TF-IDF extraction: {e}")
+            return []
+    
+    def extract_rows(self, rows: np.ndarray) -> List[Tuple[str, float]]:
+        """
+        Extract keywords for a subset of the corpus passed to fit().
         
-        vectorizer = TfidfVectorizer(
-            max_features=self.max_features,
-            ngram_range=self.ngram_range,
-            stop_words='english',
-            min_df=2,
-            max_df=0.95
-        )
+        Gives the same result as extract() on those reviews, without
+        tokenizing them again.
         
+        Args:
+            rows: Positions of the reviews within the fitted corpus
+        
+        Returns:
+            List of (keyword, score) tuples
+        """
         try:
-            tfidf_matrix = vectorizer.fit_transform(processed_reviews)
-            feature_names = vectorizer.get_feature_names_out()
-            mean_scores = np.array(tfidf_matrix.mean(axis=0)).flatten()
-            
-            keywords = list(zip(feature_names, mean_scores))
-            keywords.sort(key=lambda x: x[1], reverse=True)
-            return keywords
+            return self._rank_keywords(self._counts[rows], self._feature_names)
         except Exception as e:
             print(f"Error in TF-IDF extraction: {e}")
             return []
+    
+    def _rank_keywords(self, counts, feature_names: np.ndarray) -> List[Tuple[str, float]]:
+        """
+        Apply document-frequency pruning, max_features and TF-IDF to counts.
+        
+        Mirrors TfidfVectorizer(min_df, max_df, max_features) fitted on
+        just these rows.
+        
+        Args:
+            counts: CSR term-count matrix for the reviews
+            feature_names: Names of the matrix columns
+        
+        Returns:
+            List of (keyword, score) tuples, highest score first
+        """
+        n_docs = counts.shape[0]
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        keep = np.flatnonzero((doc_freq >= self.min_df) & (doc_freq <= self.max_df * n_docs))
+        if len(keep) == 0:
+            raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+        
+        if len(keep) > self.max_features:
+            term_freq = np.asarray(counts[:, keep].sum(axis=0)).ravel()
+            keep = np.sort(keep[(-term_freq).argsort()[:self.max_features]])
+        
+        tfidf_matrix = TfidfTransformer().fit_transform(counts[:, keep])
+        mean_scores = np.asarray(tfidf_matrix.sum(axis=0)).ravel() / n_docs
+        
+        # Stable, so tied scores keep alphabetical order
+        ranking = np.argsort(-mean_scores, kind='stable')
+        return list(zip(feature_names[keep][ranking], mean_scores[ranking]))
 
 
 class ThemeClusterer:
@@ -128,6 +354,61 @@ class ThemeClusterer:
         ]
     }
     
+    # Canonical theme order; each theme owns one bit of a uint8 theme mask
+    THEME_NAMES = list(THEME_PATTERNS) + ['General']
+    THEME_BITS = {name: 1 << i for i, name in enumerate(THEME_NAMES)}
+    
+    def __init__(self):
+        """Index THEME_PATTERNS once for keyword clustering."""
+        # Flat (pattern, theme) list, longest pattern first so the most
+        # specific match wins (e.g. 'user friendly' before 'ui'); the sort
+        # is stable, so equal lengths keep THEME_PATTERNS order
+        self._pattern_to_theme = sorted(
+            ((pattern, theme) for theme, patterns in self.THEME_PATTERNS.items() for pattern in patterns),
+            key=lambda item: -len(item[0])
+        )
+        
+        # All patterns in rank order in one string, so "keyword in pattern"
+        # is one search; the separator never occurs in a keyword
+        self._joined_patterns = '\x00'.join(pattern for pattern, _ in self._pattern_to_theme)
+        self._pattern_offsets = np.cumsum(
+            [0] + [len(pattern) + 1 for pattern, _ in self._pattern_to_theme[:-1]]
+        )
+        
+        if USE_AHOCORASICK:
+            # Each pattern maps to its best (lowest) rank
+            self._pattern_automaton = ahocorasick.Automaton()
+            for rank, (pattern, _) in enumerate(self._pattern_to_theme):
+                if pattern not in self._pattern_automaton:
+                    self._pattern_automaton.add_word(pattern, rank)
+            self._pattern_automaton.make_automaton()
+    
+    def _match_theme(self, keyword_lower: str) -> Optional[str]:
+        """
+        Find the theme of the longest pattern inside the keyword or vice versa.
+        
+        Args:
+            keyword_lower: Lowercased keyword
+        
+        Returns:
+            Theme name, or None if no pattern matches
+        """
+        best = len(self._pattern_to_theme)
+        position = self._joined_patterns.find(keyword_lower)
+        if position >= 0:
+            best = int(np.searchsorted(self._pattern_offsets, position, side='right')) - 1
+        
+        if USE_AHOCORASICK:
+            for _, rank in self._pattern_automaton.iter(keyword_lower):
+                best = min(best, rank)
+        else:
+            for rank in range(best):
+                if self._pattern_to_theme[rank][0] in keyword_lower:
+                    best = rank
+                    break
+        
+        return self._pattern_to_theme[best][1] if best < len(self._pattern_to_theme) else None
+    
     def cluster(self, keywords: List[Tuple[str, float]], bank_name: str) -> Dict[str, List[Tuple[str, float]]]:
         """
         Cluster keywords into themes.
@@ -143,19 +424,10 @@ class ThemeClusterer:
         unassigned = []
         
         for keyword, score in keywords:
-            keyword_lower = keyword.lower()
-            assigned = False
-            
-            for theme, patterns in self.THEME_PATTERNS.items():
-                for pattern in patterns:
-                    if pattern in keyword_lower or keyword_lower in pattern:
-                        theme_keywords[theme].append((keyword, score))
-                        assigned = True
-                        break
-                if assigned:
-                    break
-            
-            if not assigned:
+            theme = self._match_theme(keyword.lower())
+            if theme is not None:
+                theme_keywords[theme].append((keyword, score))
+            else:
                 unassigned.append((keyword, score))
         
         theme_keywords = {k: v for k, v in theme_keywords.items() if v}
@@ -177,44 +449,174 @@ class ThemeClusterer:
         Returns:
             List of theme names
         """
-        review_lower = TextPreprocessor.preprocess(review_text)
-        identified_themes = []
+        return self.match_themes(TextPreprocessor.preprocess(review_text), theme_keywords)
+    
+    @staticmethod
+    def theme_regexes(theme_keywords: Dict[str, List[Tuple[str, float]]]) -> Dict[str, Pattern]:
+        """
+        Compile each theme's keywords into one whole-word alternation.
         
-        for theme, keywords in theme_keywords.items():
-            for keyword, _ in keywords:
-                if keyword in review_lower:
-                    identified_themes.append(theme)
-                    break
+        Word boundaries keep 'stop' from matching 'stopwatch' while
+        multi-word keywords such as 'not work' match as phrases.
+        
+        Args:
+            theme_keywords: Dictionary of themes and their keywords
+        
+        Returns:
+            Dictionary mapping themes to compiled patterns
+        """
+        return {
+            theme: re.compile(r'\b(?:' + '|'.join(re.escape(keyword) for keyword, _ in keywords) + r')\b')
+            for theme, keywords in theme_keywords.items()
+        }
+    
+    @classmethod
+    def match_themes(cls, review_lower: str,
+                     theme_keywords: Dict[str, List[Tuple[str, float]]],
+                     theme_regexes: Optional[Dict[str, Pattern]] = None) -> List[str]:
+        """
+        Identify which themes are present in an already preprocessed review.
+        
+        Args:
+            review_lower: Review text as returned by TextPreprocessor.preprocess
+            theme_keywords: Dictionary of themes and their keywords
+            theme_regexes: Output of theme_regexes(theme_keywords); pass it
+                in when matching many reviews against one bank
+        
+        Returns:
+            List of theme names
+        """
+        if theme_regexes is None:
+            theme_regexes = cls.theme_regexes(theme_keywords)
+        return [theme for theme, regex in theme_regexes.items() if regex.search(review_lower)]
+    
+    @classmethod
+    def tag_reviews(cls, cleaned: pd.Series,
+                    theme_keywords: Dict[str, List[Tuple[str, float]]]) -> np.ndarray:
+        """
+        Identify themes for a whole column of preprocessed reviews.
+        
+        Same themes as match_themes per review, encoded as THEME_BITS masks.
+        Each theme's alternation is searched across the column in one call,
+        which Arrow-backed strings run in RE2 instead of per-row Python.
+        
+        Args:
+            cleaned: Series of preprocessed review texts
+            theme_keywords: Dictionary of themes and their keywords
+        
+        Returns:
+            uint8 array of theme masks, one per review
+        """
+        masks = np.zeros(len(cleaned), dtype=np.uint8)
+        for theme, regex in cls.theme_regexes(theme_keywords).items():
+            matched = cleaned.str.contains(regex.pattern, regex=True).to_numpy(dtype=bool)
+            masks[matched] |= cls.THEME_BITS[theme]
+        return masks
+    
+    @classmethod
+    def mask_to_themes(cls, mask: int) -> List[str]:
+        """
+        Decode a theme mask into theme names, in canonical order.
         
-        return identified_themes
+        Args:
+            mask: Bitmask built from THEME_BITS
+        
+        Returns:
+            List of theme names
+        """
+        return [name for name, bit in cls.THEME_BITS.items() if mask & bit]
+    
+    @classmethod
+    def masks_to_strings(cls, masks: np.ndarray) -> List[str]:
+        """
+        Render theme masks as '; '-joined theme names ('None' if empty).
+        
+        Each distinct mask is decoded once; rows are filled by lookup.
+        
+        Args:
+            masks: Array of theme masks
+        
+        Returns:
+            List of theme strings, one per mask
+        """
+        decoded = {
+            mask: '; '.join(cls.mask_to_themes(mask)) or 'None'
+            for mask in np.unique(masks).tolist()
+        }
+        return [decoded[mask] for mask in np.asarray(masks).tolist()]
+    
+    @classmethod
+    def theme_indicators(cls, masks: np.ndarray) -> np.ndarray:
+        """
+        Unpack theme masks into a 0/1 matrix with one column per theme.
+        
+        Args:
+            masks: Array of theme masks
+        
+        Returns:
+            uint8 array of shape (len(masks), len(THEME_NAMES)), columns in
+            canonical order
+        """
+        masks = np.asarray(masks, dtype=np.uint8)
+        bits = np.unpackbits(masks[:, None], axis=1, bitorder='little')
+        return bits[:, :len(cls.THEME_NAMES)]
+    
+    @classmethod
+    def count_themes(cls, masks: np.ndarray) -> Dict[str, int]:
+        """
+        Count how many reviews carry each theme.
+        
+        Args:
+            masks: Array of theme masks
+        
+        Returns:
+            Dictionary mapping theme names to review counts, in canonical order
+        """
+        counts = cls.theme_indicators(masks).sum(axis=0)
+        return {name: int(counts[i]) for i, name in enumerate(cls.THEME_NAMES)}
 
 
 class ThematicAnalyzer:
     """Main class for thematic analysis."""
     
-    def __init__(self):
-        """Initialize the thematic analyzer."""
-        self.keyword_extractor = KeywordExtractor()
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Initialize the thematic analyzer.
+        
+        Args:
+            cache_dir: Directory for cached term counts (see KeywordExtractor)
+        """
+        self.keyword_extractor = KeywordExtractor(cache_dir=cache_dir)
         self.theme_clusterer = ThemeClusterer()
         self.preprocessor = TextPreprocessor()
     
-    def analyze_bank(self, bank_df: pd.DataFrame, bank_name: str) -> pd.DataFrame:
+    def analyze_bank(self, bank_df: pd.DataFrame, bank_name: str,
+                     rows: Optional[np.ndarray] = None,
+                     cleaned: Optional[pd.Series] = None) -> pd.DataFrame:
         """
         Analyze themes for a specific bank.
         
         Args:
             bank_df: DataFrame with reviews for one bank
             bank_name: Name of the bank
+            rows: Positions of bank_df within the corpus fitted on the
+                keyword extractor; the reviews are re-tokenized if omitted
+            cleaned: Preprocessed review texts aligned with bank_df;
+                computed here if omitted
         
         Returns:
             DataFrame with themes added
         """
         print(f"\nAnalyzing themes for {bank_name}...")
-        bank_reviews = bank_df['review'].tolist()
+        if cleaned is None:
+            cleaned = self.preprocessor.preprocess_series(bank_df['review'])
         
         # Extract keywords
-        print(f"  Extracting keywords from {len(bank_reviews)} reviews...")
-        keywords = self.keyword_extractor.extract(bank_reviews)
+        print(f"  Extracting keywords from {len(bank_df)} reviews...")
+        if rows is not None:
+            keywords = self.keyword_extractor.extract_rows(rows)
+        else:
+            keywords = self.keyword_extractor.extract(cleaned.tolist(), preprocessed=True)
         
         print(f"  Found {len(keywords)} keywords")
         print(f"  Top 10 keywords: {[k[0] for k in keywords[:10]]}")
@@ -230,15 +632,13 @@ class ThematicAnalyzer:
         
         # Identify themes for each review
         print(f"  Identifying themes in reviews...")
-        bank_df = bank_df.copy()
-        bank_df['themes'] = bank_df['review'].apply(
-            lambda x: self.theme_clusterer.identify_themes_in_review(x, theme_keywords)
-        )
-        bank_df['themes_str'] = bank_df['themes'].apply(
-            lambda x: '; '.join(x) if x else 'None'
-        )
+        theme_mask = self.theme_clusterer.tag_reviews(cleaned, theme_keywords)
         
-        return bank_df
+        # assign shares the existing columns instead of copying the bank's rows
+        return bank_df.assign(
+            theme_mask=theme_mask,
+            themes_str=self.theme_clusterer.masks_to_strings(theme_mask)
+        )
     
     def analyze_all_banks(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -252,9 +652,15 @@ class ThematicAnalyzer:
         """
         all_results = []
         
-        for bank in df['bank'].unique():
-            bank_df = df[df['bank'] == bank]
-            bank_result = self.analyze_bank(bank_df, bank)
+        # Clean and tokenize every review once; each bank then slices its rows
+        cleaned = self.preprocessor.preprocess_parallel(df['review'])
+        self.keyword_extractor.fit(cleaned.tolist(), preprocessed=True)
+        
+        # One partitioning pass gives every bank's row positions
+        bank_rows = df.groupby('bank', sort=False, observed=True).indices
+        for bank, rows in bank_rows.items():
+            bank_df = df.iloc[rows]
+            bank_result = self.analyze_bank(bank_df, bank, rows, cleaned.iloc[rows])
             all_results.append(bank_result)
         
         return pd.concat(all_results, ignore_index=True)
@@ -265,21 +671,24 @@ class ThematicAnalyzer:
         print("Thematic Analysis Summary")
         print("=" * 50)
         
-        for bank in df['bank'].unique():
-            bank_df = df[df['bank'] == bank]
-            all_themes = []
-            
-            for themes_list in bank_df['themes']:
-                all_themes.extend(themes_list)
-            
-            unique_themes = set(all_themes)
-            theme_counts = Counter(all_themes)
+        # Per-bank theme counts for every bank in one grouped sum
+        indicators = pd.DataFrame(
+            self.theme_clusterer.theme_indicators(df['theme_mask'].to_numpy()),
+            columns=self.theme_clusterer.THEME_NAMES,
+            index=df.index
+        )
+        counts = indicators.groupby(df['bank'], sort=False, observed=True).sum()
+        
+        for bank, bank_counts in counts.iterrows():
+            # Stable sort keeps canonical theme order among ties
+            theme_counts = bank_counts[bank_counts > 0].sort_values(ascending=False, kind='stable')
+            unique_themes = set(theme_counts.index)
             
             print(f"\n{bank}:")
             print(f"  Unique themes identified: {len(unique_themes)}")
             print(f"  Themes: {', '.join(sorted(unique_themes))}")
             print(f"  Top themes:")
-            for theme, count in theme_counts.most_common(5):
+            for theme, count in theme_counts.head(5).items():
                 print(f"    - {theme}: {count} reviews")
             
             if len(unique_themes) >= 3:
@@ -293,18 +702,21 @@ class ThematicAnalyzer:
 class ThematicAnalysisPipeline:
     """Complete pipeline for thematic analysis."""
     
-    def __init__(self, input_file: str = '../Data/all_banks_with_sentiment.csv',
-                 output_file: str = '../Data/all_banks_with_sentiment_themes.csv'):
+    def __init__(self, input_file: str = '../Data/all_banks_with_sentiment.parquet',
+                 output_file: str = '../Data/all_banks_with_sentiment_themes.csv',
+                 cache_dir: Optional[str] = None):
         """
         Initialize the pipeline.
         
         Args:
-            input_file: Path to input CSV
+            input_file: Path to input Parquet or CSV file
             output_file: Path to output CSV
+            cache_dir: Directory for cached term counts, reused by later
+                runs on the same reviews (disabled if None)
         """
         self.input_file = input_file
         self.output_file = output_file
-        self.analyzer = ThematicAnalyzer()
+        self.analyzer = ThematicAnalyzer(cache_dir=cache_dir)
     
     def run(self) -> pd.DataFrame:
         """
@@ -316,15 +728,17 @@ class ThematicAnalysisPipeline:
         print("Starting thematic analysis...")
         print("=" * 50)
         
-        # Try to find input file
-        if not os.path.exists(self.input_file):
-            self.input_file = '../Data/all_banks.csv'
+        # Try to find input file, falling back to older sentiment output
+        for fallback_file in ('../Data/all_banks_with_sentiment.csv', '../Data/all_banks.csv'):
+            if os.path.exists(self.input_file):
+                break
+            self.input_file = fallback_file
             print(f"Sentiment file not found, using: {self.input_file}")
         
         if not os.path.exists(self.input_file):
             raise FileNotFoundError(f"Input file not found: {self.input_file}. Please run task1_preprocessing.py first")
         
-        df = pd.read_csv(self.input_file)
+        df = read_reviews(self.input_file)
         print(f"Loaded {len(df)} reviews from {self.input_file}")
         
         # Analyze themes
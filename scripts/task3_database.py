@@ -4,15 +4,63 @@ Stores cleaned and processed review data in PostgreSQL database.
 """
 
 import pandas as pd
+import numpy as np
 import psycopg2
 from psycopg2.extras import execute_values
+import io
 import os
 from dotenv import load_dotenv
 import sys
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional, Tuple, Any
+from utils import read_reviews
 
 load_dotenv()
 
+# Advisory lock taken while creating the schema, so parallel runs do not
+# race on CREATE ... IF NOT EXISTS or the seed bank rows
+BOOTSTRAP_LOCK_NAME = 'bank_reviews_bootstrap'
+
+# Rows written per COPY buffer, bounding the size of the in-memory CSV
+COPY_PAGE_SIZE = 5000
+
+# Secondary indexes on reviews, dropped around large loads and rebuilt
+# afterwards; the unique dedup index stays since inserts rely on it
+REVIEW_SECONDARY_INDEXES = {
+    'idx_reviews_bank_id': "CREATE INDEX IF NOT EXISTS idx_reviews_bank_id ON reviews(bank_id)",
+    'idx_reviews_rating': "CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews(rating)",
+    'idx_reviews_sentiment_label':
+        "CREATE INDEX IF NOT EXISTS idx_reviews_sentiment_label ON reviews(sentiment_label)",
+    'idx_reviews_review_date': "CREATE INDEX IF NOT EXISTS idx_reviews_review_date ON reviews(review_date)"
+}
+
+# Loads at least this large rebuild the secondary indexes once instead of
+# updating them row by row
+INDEX_REBUILD_MIN_ROWS = 100_000
+
+# Review file columns used when preparing rows (missing ones are skipped)
+REVIEW_SOURCE_COLUMNS = ['review', 'bank', 'rating', 'date', 'sentiment_label',
+                         'sentiment_score', 'source']
+
+# Removes duplicate reviews left by loads made before idx_reviews_dedup
+# existed (keeping the oldest row), so the unique index can be built; it
+# only runs while the index is missing
+REVIEW_DEDUP_MIGRATION = """
+DO $$
+BEGIN
+    IF to_regclass('idx_reviews_dedup') IS NULL THEN
+        DELETE FROM reviews a USING reviews b
+        WHERE a.review_id > b.review_id
+          AND a.bank_id = b.bank_id
+          AND md5(a.review_text) = md5(b.review_text)
+          AND a.review_date IS NOT DISTINCT FROM b.review_date;
+    END IF;
+END $$
+"""
+
+# Columns loaded into the reviews table, in the order rows are prepared
+REVIEW_INSERT_COLUMNS = ('bank_id, review_text, rating, review_date, '
+                         'sentiment_label, sentiment_score, source')
+
 
 class DatabaseConnection:
     """Handles database connection management."""
@@ -88,6 +136,10 @@ class SchemaManager:
         cursor = self.conn.cursor()
         
         try:
+            # Serialize concurrent bootstraps; the lock is released when the
+            # schema transaction commits or rolls back
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (BOOTSTRAP_LOCK_NAME,))
+            
             schema_file = os.path.join(os.path.dirname(__file__), '..', 'schema.sql')
             if os.path.exists(schema_file):
                 with open(schema_file, 'r') as f:
@@ -109,7 +161,10 @@ class SchemaManager:
         """Create tables manually if schema file not found."""
         print("Creating tables manually...")
         
-        cursor.execute("""
+        # All DDL goes to the server as one multi-statement query, so the
+        # whole bootstrap is a single round trip
+        statements = [
+            """
             CREATE TABLE IF NOT EXISTS banks (
                 bank_id SERIAL PRIMARY KEY,
                 bank_name VARCHAR(255) NOT NULL,
@@ -117,9 +172,8 @@ class SchemaManager:
                 description TEXT,
                 created_at TIMESTAMP DEFAULT NOW()
             )
-        """)
-        
-        cursor.execute("""
+            """,
+            """
             CREATE TABLE IF NOT EXISTS reviews (
                 review_id SERIAL PRIMARY KEY,
                 bank_id INTEGER NOT NULL,
@@ -133,21 +187,50 @@ class SchemaManager:
                 CONSTRAINT reviews_bank_id_fkey FOREIGN KEY (bank_id) 
                     REFERENCES banks(bank_id) ON DELETE CASCADE
             )
-        """)
-        
-        # Create indexes
-        for index_sql in [
-            "CREATE INDEX IF NOT EXISTS idx_reviews_bank_id ON reviews(bank_id)",
-            "CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews(rating)",
-            "CREATE INDEX IF NOT EXISTS idx_reviews_sentiment_label ON reviews(sentiment_label)",
-            "CREATE INDEX IF NOT EXISTS idx_reviews_review_date ON reviews(review_date)",
-            "CREATE INDEX IF NOT EXISTS idx_banks_bank_name ON banks(bank_name)"
-        ]:
-            cursor.execute(index_sql)
+            """,
+            # Indexes
+            *REVIEW_SECONDARY_INDEXES.values(),
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_banks_bank_name_unique ON banks(bank_name)",
+            "DROP INDEX IF EXISTS idx_banks_bank_name",
+            REVIEW_DEDUP_MIGRATION,
+            """CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_dedup
+                ON reviews(bank_id, md5(review_text), COALESCE(review_date, DATE '0001-01-01'))"""
+        ]
+        cursor.execute(';\n'.join(statements))
         
         self.conn.commit()
         print("✓ Database tables created")
     
+    def drop_review_indexes(self):
+        """Drop the secondary review indexes ahead of a bulk load."""
+        cursor = self.conn.cursor()
+        
+        try:
+            cursor.execute(f"DROP INDEX IF EXISTS {', '.join(REVIEW_SECONDARY_INDEXES)}")
+            self.conn.commit()
+            print(f"✓ Dropped {len(REVIEW_SECONDARY_INDEXES)} review indexes for bulk load")
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"✗ Error dropping review indexes: {e}")
+            raise
+        finally:
+            cursor.close()
+    
+    def recreate_review_indexes(self):
+        """Rebuild the secondary review indexes after a bulk load."""
+        cursor = self.conn.cursor()
+        
+        try:
+            cursor.execute(';\n'.join(REVIEW_SECONDARY_INDEXES.values()))
+            self.conn.commit()
+            print(f"✓ Rebuilt {len(REVIEW_SECONDARY_INDEXES)} review indexes")
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            print(f"✗ Error rebuilding review indexes: {e}")
+            raise
+        finally:
+            cursor.close()
+    
     def insert_banks(self) -> Dict[str, int]:
         """
         Insert bank information into banks table.
@@ -159,26 +242,30 @@ class SchemaManager:
         bank_id_map = {}
         
         try:
-            for bank_code, bank_data in self.BANK_INFO.items():
-                cursor.execute(
-                    "SELECT bank_id FROM banks WHERE bank_name = %s",
-                    (bank_data['bank_name'],)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    bank_id_map[bank_code] = result[0]
-                    print(f"✓ Bank '{bank_data['bank_name']}' already exists (ID: {result[0]})")
+            # One upsert for all banks; the no-op update makes existing rows
+            # come back in RETURNING too, and xmax = 0 marks fresh inserts
+            rows = execute_values(
+                cursor,
+                """
+                INSERT INTO banks (bank_name, app_name, description)
+                VALUES %s
+                ON CONFLICT (bank_name) DO UPDATE SET app_name = EXCLUDED.app_name
+                RETURNING bank_id, bank_name, (xmax = 0) AS inserted
+                """,
+                [
+                    (bank_data['bank_name'], bank_data['app_name'], bank_data['description'])
+                    for bank_data in self.BANK_INFO.values()
+                ],
+                fetch=True
+            )
+            bank_codes = {bank_data['bank_name']: bank_code for bank_code, bank_data in self.BANK_INFO.items()}
+            
+            for bank_id, bank_name, inserted in rows:
+                bank_id_map[bank_codes[bank_name]] = bank_id
+                if inserted:
+                    print(f"✓ Inserted bank '{bank_name}' (ID: {bank_id})")
                 else:
-                    cursor.execute("""
-                        INSERT INTO banks (bank_name, app_name, description)
-                        VALUES (%s, %s, %s)
-                        RETURNING bank_id
-                    """, (bank_data['bank_name'], bank_data['app_name'], bank_data['description']))
-                    
-                    bank_id = cursor.fetchone()[0]
-                    bank_id_map[bank_code] = bank_id
-                    print(f"✓ Inserted bank '{bank_data['bank_name']}' (ID: {bank_id})")
+                    print(f"✓ Bank '{bank_name}' already exists (ID: {bank_id})")
             
             self.conn.commit()
             return bank_id_map
@@ -216,94 +303,49 @@ class ReviewInserter:
         cursor = self.conn.cursor()
         
         try:
-            # Check existing reviews
-            print("Checking for existing reviews to avoid duplicates...")
-            cursor.execute("""
-                SELECT bank_id, review_text, review_date, COUNT(*) as count
-                FROM reviews
-                GROUP BY bank_id, review_text, review_date
-            """)
-            existing_reviews = set()
-            for row in cursor.fetchall():
-                key = (row[0], str(row[1])[:100], row[2])
-                existing_reviews.add(key)
-            
-            print(f"Found {len(existing_reviews)} existing review combinations in database")
-            
             # Prepare data for insertion
-            reviews_to_insert = []
-            skipped_count = 0
+            rows = self._prepare_reviews(df, bank_id_map)
             
-            for _, row in df.iterrows():
-                bank_code = row['bank']
-                if bank_code not in bank_id_map:
-                    print(f"⚠ Skipping review: Unknown bank '{bank_code}'")
-                    continue
-                
-                bank_id = bank_id_map[bank_code]
-                
-                # Parse date
-                review_date = None
-                if pd.notna(row.get('date')):
-                    try:
-                        review_date = pd.to_datetime(row['date']).date()
-                    except:
-                        pass
-                
-                # Check for duplicate
-                review_text = str(row['review'])
-                duplicate_key = (bank_id, review_text[:100], review_date)
-                if duplicate_key in existing_reviews:
-                    skipped_count += 1
-                    continue
-                
-                # Parse rating
-                rating = None
-                if pd.notna(row.get('rating')):
-                    try:
-                        rating = float(row['rating'])
-                        if not (1 <= rating <= 5):
-                            rating = None
-                    except:
-                        pass
-                
-                # Get sentiment data
-                sentiment_label = row.get('sentiment_label') if 'sentiment_label' in row else None
-                sentiment_score = row.get('sentiment_score') if 'sentiment_score' in row else None
-                
-                if pd.notna(sentiment_score):
-                    try:
-                        sentiment_score = float(sentiment_score)
-                    except:
-                        sentiment_score = None
-                
-                source = row.get('source', 'Google Play')
+            # Bulk load with COPY into a staging table, then move the rows
+            # over in one statement; duplicates are dropped by the
+            # idx_reviews_dedup unique index
+            if len(rows) > 0:
+                cursor.execute(f"""
+                    CREATE TEMP TABLE reviews_staging ON COMMIT DROP AS
+                    SELECT {REVIEW_INSERT_COLUMNS} FROM reviews WITH NO DATA
+                """)
+                # Missing values are empty unquoted fields; review_text is
+                # never missing, so an empty review stays an empty string
+                copy_query = (
+                    f"COPY reviews_staging ({REVIEW_INSERT_COLUMNS}) FROM STDIN "
+                    "WITH (FORMAT csv, DELIMITER E'\\t', NULL '', FORCE_NOT_NULL (review_text))"
+                )
+                for start in range(0, len(rows), COPY_PAGE_SIZE):
+                    buffer = io.StringIO()
+                    rows.iloc[start:start + COPY_PAGE_SIZE].to_csv(
+                        buffer, sep='\t', header=False, index=False, na_rep=''
+                    )
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_query, buffer)
                 
-                reviews_to_insert.append((
-                    bank_id, review_text, rating, review_date,
-                    sentiment_label, sentiment_score, source
-                ))
-            
-            # Batch insert
-            if reviews_to_insert:
-                insert_query = """
-                    INSERT INTO reviews (bank_id, review_text, rating, review_date, 
-                                       sentiment_label, sentiment_score, source)
-                    VALUES %s
-                """
-                execute_values(cursor, insert_query, reviews_to_insert)
+                cursor.execute(f"""
+                    INSERT INTO reviews ({REVIEW_INSERT_COLUMNS})
+                    SELECT {REVIEW_INSERT_COLUMNS} FROM reviews_staging
+                    ON CONFLICT DO NOTHING
+                """)
+                inserted_count = cursor.rowcount
                 self.conn.commit()
                 
-                inserted_count = len(reviews_to_insert)
+                skipped_count = len(rows) - inserted_count
+                if inserted_count == 0:
+                    print(f"⚠ All {skipped_count} reviews were duplicates - nothing to insert")
+                    return 0
                 print(f"✓ Inserted {inserted_count} new reviews")
                 if skipped_count > 0:
                     print(f"⚠ Skipped {skipped_count} duplicate reviews")
                 return inserted_count
             else:
-                if skipped_count > 0:
-                    print(f"⚠ All {skipped_count} reviews were duplicates - nothing to insert")
-                else:
-                    print("⚠ No reviews to insert")
+                print("⚠ No reviews to insert")
                 return 0
         except psycopg2.Error as e:
             self.conn.rollback()
@@ -313,6 +355,58 @@ class ReviewInserter:
             cursor.close()
 
 
+    @staticmethod
+    def _prepare_reviews(df: pd.DataFrame, bank_id_map: Dict[str, int]) -> pd.DataFrame:
+        """
+        Build insert-ready review rows with column operations.
+        
+        Drops reviews of unknown banks; missing or invalid values become
+        None (SQL NULL).
+        
+        Args:
+            df: DataFrame with review data
+            bank_id_map: Dictionary mapping bank codes to bank_ids
+        
+        Returns:
+            DataFrame of rows in INSERT column order
+        """
+        bank_ids = df['bank'].astype(object).map(bank_id_map)
+        known = bank_ids.notna()
+        for bank_code, count in df.loc[~known, 'bank'].value_counts().items():
+            print(f"⚠ Skipping {count} reviews: Unknown bank '{bank_code}'")
+        df = df[known]
+        bank_ids = bank_ids[known].astype(int)
+        
+        # Each value is parsed on its own, as the per-row parse used to
+        if 'date' in df.columns:
+            dates = pd.to_datetime(df['date'], format='mixed', errors='coerce')
+            review_dates = dates.dt.date.astype(object).where(dates.notna(), None)
+        else:
+            review_dates = pd.Series(None, index=df.index, dtype=object)
+        
+        review_texts = pd.Series([str(text) for text in df['review']], index=df.index, dtype=object)
+        
+        def column(name: str, default: Any = None) -> pd.Series:
+            if name in df.columns:
+                return df[name]
+            return pd.Series(default, index=df.index, dtype=object)
+        
+        def nullable(values: pd.Series) -> pd.Series:
+            return values.astype(object).where(values.notna(), None)
+        
+        ratings = pd.to_numeric(column('rating'), errors='coerce')
+        rows = pd.DataFrame({
+            'bank_id': bank_ids,
+            'review_text': review_texts,
+            'rating': nullable(ratings.where(ratings.between(1, 5))),
+            'review_date': review_dates,
+            'sentiment_label': nullable(column('sentiment_label')),
+            'sentiment_score': nullable(pd.to_numeric(column('sentiment_score'), errors='coerce')),
+            'source': nullable(column('source', 'Google Play'))
+        })
+        return rows
+
+
 class DataIntegrityVerifier:
     """Handles data integrity verification."""
     
@@ -334,66 +428,68 @@ class DataIntegrityVerifier:
             print("Data Integrity Verification")
             print("=" * 50)
             
+            # Every check in one query and one round trip; the lists come
+            # back as JSON arrays of rows (averages as text to keep 2 d.p.)
+            cursor.execute("""
+                WITH per_bank AS (
+                    SELECT b.bank_name,
+                           COUNT(r.review_id) AS review_count,
+                           ROUND(AVG(r.rating)::numeric, 2) AS avg_rating,
+                           COUNT(r.rating) AS rated_count
+                    FROM banks b
+                    LEFT JOIN reviews r ON b.bank_id = r.bank_id
+                    GROUP BY b.bank_id, b.bank_name
+                ),
+                sentiment AS (
+                    SELECT sentiment_label, COUNT(*) AS count
+                    FROM reviews
+                    WHERE sentiment_label IS NOT NULL
+                    GROUP BY sentiment_label
+                )
+                SELECT COUNT(*),
+                       COUNT(*) FILTER (WHERE sentiment_label IS NULL),
+                       MIN(review_date),
+                       MAX(review_date),
+                       (SELECT json_agg(json_build_array(bank_name, review_count)
+                                        ORDER BY review_count DESC)
+                        FROM per_bank),
+                       (SELECT json_agg(json_build_array(bank_name, avg_rating::text, rated_count)
+                                        ORDER BY avg_rating DESC)
+                        FROM per_bank WHERE rated_count > 0),
+                       (SELECT json_agg(json_build_array(sentiment_label, count)
+                                        ORDER BY count DESC)
+                        FROM sentiment)
+                FROM reviews
+            """)
+            (total_reviews, missing_sentiment, first_date, last_date,
+             bank_counts, bank_ratings, sentiment_counts) = cursor.fetchone()
+            
             # Total reviews
-            cursor.execute("SELECT COUNT(*) FROM reviews")
-            total_reviews = cursor.fetchone()[0]
             print(f"\nTotal reviews in database: {total_reviews}")
             
             # Reviews per bank
             print("\nReviews per bank:")
-            cursor.execute("""
-                SELECT b.bank_name, COUNT(r.review_id) as review_count
-                FROM banks b
-                LEFT JOIN reviews r ON b.bank_id = r.bank_id
-                GROUP BY b.bank_id, b.bank_name
-                ORDER BY review_count DESC
-            """)
-            for row in cursor.fetchall():
-                print(f"  {row[0]}: {row[1]} reviews")
+            for bank_name, review_count in bank_counts or []:
+                print(f"  {bank_name}: {review_count} reviews")
             
             # Average rating per bank
             print("\nAverage rating per bank:")
-            cursor.execute("""
-                SELECT b.bank_name, 
-                       ROUND(AVG(r.rating)::numeric, 2) as avg_rating,
-                       COUNT(r.review_id) as review_count
-                FROM banks b
-                LEFT JOIN reviews r ON b.bank_id = r.bank_id
-                WHERE r.rating IS NOT NULL
-                GROUP BY b.bank_id, b.bank_name
-                ORDER BY avg_rating DESC
-            """)
-            for row in cursor.fetchall():
-                print(f"  {row[0]}: {row[1]} (from {row[2]} reviews)")
+            for bank_name, avg_rating, review_count in bank_ratings or []:
+                print(f"  {bank_name}: {avg_rating} (from {review_count} reviews)")
             
             # Sentiment distribution
             print("\nSentiment distribution:")
-            cursor.execute("""
-                SELECT sentiment_label, COUNT(*) as count
-                FROM reviews
-                WHERE sentiment_label IS NOT NULL
-                GROUP BY sentiment_label
-                ORDER BY count DESC
-            """)
-            for row in cursor.fetchall():
-                print(f"  {row[0]}: {row[1]} reviews")
+            for sentiment_label, count in sentiment_counts or []:
+                print(f"  {sentiment_label}: {count} reviews")
             
             # Missing sentiment
-            cursor.execute("SELECT COUNT(*) FROM reviews WHERE sentiment_label IS NULL")
-            missing_sentiment = cursor.fetchone()[0]
             if missing_sentiment > 0:
                 print(f"\n⚠ Reviews without sentiment data: {missing_sentiment}")
             
             # Date range
             print("\nReview date range:")
-            cursor.execute("""
-                SELECT MIN(review_date), MAX(review_date)
-                FROM reviews
-                WHERE review_date IS NOT NULL
-            """)
-            date_range = cursor.fetchone()
-            if date_range[0]:
-                print(f"  From: {date_range[0]} to {date_range[1]}")
+            if first_date:
+                print(f"  From: {first_date} to {last_date}")
             
             print("=" * 50 + "\n")
         except psycopg2.Error as e:
@@ -424,34 +520,57 @@ class DatabaseManager:
         if not os.path.exists(self.csv_file):
             raise FileNotFoundError(f"CSV file not found: {self.csv_file}. Please run task1_preprocessing.py first")
         
-        df = pd.read_csv(self.csv_file)
+        df = read_reviews(self.csv_file, columns=REVIEW_SOURCE_COLUMNS)
         print(f"✓ Loaded {len(df)} reviews from {self.csv_file}")
         return df
     
+    @staticmethod
+    def _review_keys(df: pd.DataFrame) -> np.ndarray:
+        """
+        Hash each (bank, review) pair to a uint64 join key.
+        
+        Args:
+            df: DataFrame with bank and review columns
+        
+        Returns:
+            uint64 array, one key per row
+        """
+        return pd.util.hash_pandas_object(df[['bank', 'review']], index=False).to_numpy()
+    
     def check_sentiment_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Check if sentiment data exists and merge if available."""
         if 'sentiment_label' in df.columns and 'sentiment_score' in df.columns:
             print("✓ Sentiment data found in CSV")
             return df
         
-        sentiment_file = os.path.join(os.path.dirname(__file__), '..', 'Data', 'all_banks_with_sentiment.csv')
+        data_dir = os.path.join(os.path.dirname(__file__), '..', 'Data')
+        sentiment_file = os.path.join(data_dir, 'all_banks_with_sentiment.parquet')
+        if not os.path.exists(sentiment_file):
+            sentiment_file = os.path.join(data_dir, 'all_banks_with_sentiment.csv')
         if os.path.exists(sentiment_file):
             print(f"✓ Loading sentiment data from {sentiment_file}")
-            sentiment_df = pd.read_csv(sentiment_file)
+            sentiment_df = read_reviews(
+                sentiment_file, columns=['review', 'bank', 'sentiment_label', 'sentiment_score']
+            )
             
             if 'sentiment_label' in sentiment_df.columns:
-                df = pd.merge(
-                    df,
-                    sentiment_df[['review', 'bank', 'sentiment_label', 'sentiment_score']],
-                    on=['review', 'bank'],
-                    how='left',
-                    suffixes=('', '_sentiment')
-                )
+                review_keys = self._review_keys(df)
+                sentiment_keys = self._review_keys(sentiment_df)
+                
+                if np.array_equal(review_keys, sentiment_keys):
+                    # Same reviews in the same order (the sentiment stage
+                    # only appends columns), so no join is needed
+                    matched = sentiment_df[['sentiment_label', 'sentiment_score']]
+                else:
+                    # Join on a uint64 hash of (bank, review) instead of
+                    # merging on the review strings; the first row per key wins
+                    lookup = sentiment_df[['sentiment_label', 'sentiment_score']].set_axis(sentiment_keys)
+                    lookup = lookup[~lookup.index.duplicated(keep='first')]
+                    matched = lookup.reindex(review_keys)
                 
-                if 'sentiment_label_sentiment' in df.columns:
-                    df['sentiment_label'] = df['sentiment_label_sentiment']
-                    df['sentiment_score'] = df['sentiment_score_sentiment']
-                    df = df.drop(['sentiment_label_sentiment', 'sentiment_score_sentiment'], axis=1)
+                matched = matched.set_axis(df.index)
+                df['sentiment_label'] = matched['sentiment_label']
+                df['sentiment_score'] = matched['sentiment_score']
             
             print("✓ Sentiment data merged")
         else:
@@ -488,8 +607,16 @@ class DatabaseManager:
             df = self.load_data()
             df = self.check_sentiment_data(df)
             
-            # Insert reviews
-            inserted_count = self.review_inserter.insert_reviews(df, bank_id_map)
+            # Insert reviews; large loads build the secondary indexes once
+            # at the end instead of maintaining them per row
+            bulk_load = len(df) >= INDEX_REBUILD_MIN_ROWS
+            if bulk_load:
+                self.schema_manager.drop_review_indexes()
+            try:
+                inserted_count = self.review_inserter.insert_reviews(df, bank_id_map)
+            finally:
+                if bulk_load:
+                    self.schema_manager.recreate_review_indexes()
             
             # Verify data integrity
             self.verifier.verify()
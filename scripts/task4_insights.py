@@ -8,8 +8,55 @@ import numpy as np
 from collections import Counter
 import os
 import re
-from typing import Dict, List, Tuple, Any
-from utils import TextProcessor
+import hashlib
+from joblib import Parallel, delayed
+from typing import Dict, List, Tuple, Any, Optional
+from utils import TextProcessor, read_reviews
+
+# Columns the insights pipeline reads; any others are never loaded
+INSIGHTS_COLUMNS = ['review', 'rating', 'bank', 'sentiment_label', 'themes', 'themes_str']
+
+# Analyzing a bank takes roughly 6us per review, so spreading banks over
+# processes (around a second to start) only pays off for large datasets
+PARALLEL_MIN_REVIEWS = 500_000
+
+
+def _keyword_patterns(keyword_groups: Dict[str, List[str]]) -> Dict[str, str]:
+    """
+    Build one substring alternation per keyword group.
+    
+    Args:
+        keyword_groups: Dictionary mapping group names to keywords
+    
+    Returns:
+        Dictionary mapping group names to regex patterns
+    """
+    return {
+        name: '|'.join(re.escape(keyword) for keyword in keywords)
+        for name, keywords in keyword_groups.items()
+    }
+
+
+def _count_keyword_mentions(reviews: pd.Series, cleaned: pd.Series,
+                            pattern: str, max_examples: int = 3) -> Tuple[int, List[str]]:
+    """
+    Count reviews whose cleaned text contains any keyword of a group.
+    
+    The group's alternation is searched over the whole column at once
+    instead of review by review.
+    
+    Args:
+        reviews: Original review texts
+        cleaned: The same reviews after TextProcessor.clean_series
+        pattern: Alternation from _keyword_patterns
+        max_examples: Number of example reviews to return
+    
+    Returns:
+        Tuple of (matching review count, truncated example reviews)
+    """
+    mask = cleaned.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+    examples = (reviews[mask].head(max_examples).str.slice(0, 100) + '...').tolist()
+    return int(mask.sum()), examples
 
 
 class DriverAnalyzer:
@@ -26,35 +73,31 @@ class DriverAnalyzer:
     def __init__(self):
         """Initialize driver analyzer."""
         self.text_processor = TextProcessor()
+        self.patterns = _keyword_patterns(self.POSITIVE_KEYWORDS)
     
-    def identify_drivers(self, df: pd.DataFrame, bank_name: str, 
-                        min_reviews: int = 10) -> List[Dict[str, Any]]:
+    def identify_drivers(self, positive_reviews: pd.DataFrame,
+                        min_reviews: int = 10,
+                        cleaned: Optional[pd.Series] = None) -> List[Dict[str, Any]]:
         """
         Identify satisfaction drivers for a bank.
         
         Args:
-            df: DataFrame with reviews
-            bank_name: Name of the bank
+            positive_reviews: The bank's positive (4-5 star) reviews
             min_reviews: Minimum reviews mentioning a driver
+            cleaned: Reviews of positive_reviews after
+                TextProcessor.clean_series, in the same row order; computed
+                here if omitted
         
         Returns:
             List of driver dictionaries
         """
-        bank_df = df[df['bank'] == bank_name]
-        # Focus on positive reviews (4-5 stars)
-        positive_reviews = bank_df[bank_df['rating'] >= 4]
+        # Clean every review once; each driver is then one column scan
+        if cleaned is None:
+            cleaned = self.text_processor.clean_series(positive_reviews['review'])
         
         drivers = []
-        for driver_name, keywords in self.POSITIVE_KEYWORDS.items():
-            count = 0
-            examples = []
-            
-            for _, row in positive_reviews.iterrows():
-                review_text = self.text_processor.clean_text(str(row['review']))
-                if any(keyword in review_text for keyword in keywords):
-                    count += 1
-                    if len(examples) < 3:
-                        examples.append(row['review'][:100] + '...')
+        for driver_name, pattern in self.patterns.items():
+            count, examples = _count_keyword_mentions(positive_reviews['review'], cleaned, pattern)
             
             if count >= min_reviews:
                 drivers.append({
@@ -83,35 +126,31 @@ class PainPointAnalyzer:
     def __init__(self):
         """Initialize pain point analyzer."""
         self.text_processor = TextProcessor()
+        self.patterns = _keyword_patterns(self.NEGATIVE_KEYWORDS)
     
-    def identify_pain_points(self, df: pd.DataFrame, bank_name: str,
-                            min_reviews: int = 10) -> List[Dict[str, Any]]:
+    def identify_pain_points(self, negative_reviews: pd.DataFrame,
+                            min_reviews: int = 10,
+                            cleaned: Optional[pd.Series] = None) -> List[Dict[str, Any]]:
         """
         Identify pain points for a bank.
         
         Args:
-            df: DataFrame with reviews
-            bank_name: Name of the bank
+            negative_reviews: The bank's negative (1-2 star) reviews
             min_reviews: Minimum reviews mentioning a pain point
+            cleaned: Reviews of negative_reviews after
+                TextProcessor.clean_series, in the same row order; computed
+                here if omitted
         
         Returns:
             List of pain point dictionaries
         """
-        bank_df = df[df['bank'] == bank_name]
-        # Focus on negative reviews (1-2 stars)
-        negative_reviews = bank_df[bank_df['rating'] <= 2]
+        # Clean every review once; each pain point is then one column scan
+        if cleaned is None:
+            cleaned = self.text_processor.clean_series(negative_reviews['review'])
         
         pain_points = []
-        for pain_name, keywords in self.NEGATIVE_KEYWORDS.items():
-            count = 0
-            examples = []
-            
-            for _, row in negative_reviews.iterrows():
-                review_text = self.text_processor.clean_text(str(row['review']))
-                if any(keyword in review_text for keyword in keywords):
-                    count += 1
-                    if len(examples) < 3:
-                        examples.append(row['review'][:100] + '...')
+        for pain_name, pattern in self.patterns.items():
+            count, examples = _count_keyword_mentions(negative_reviews['review'], cleaned, pattern)
             
             if count >= min_reviews:
                 pain_points.append({
@@ -143,7 +182,7 @@ class BankComparator:
         Returns:
             DataFrame with comparison metrics
         """
-        comparison = df.groupby('bank').agg({
+        comparison = df.groupby('bank', observed=True).agg({
             'rating': ['mean', 'std', 'count'],
         }).round(2)
         
@@ -167,6 +206,44 @@ class BankComparator:
         comparison = pd.crosstab(df['bank'], df['sentiment_label'], normalize='index') * 100
         return comparison.round(2)
     
+    def compare_ratings_and_sentiment(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Compare ratings and sentiment distribution from one bank grouping.
+        
+        Same results as compare_ratings and compare_sentiment, but the bank
+        column is hashed once: sentiment labels become indicator columns
+        summed alongside the rating aggregates.
+        
+        Args:
+            df: DataFrame with reviews (and optionally sentiment data)
+        
+        Returns:
+            Tuple of (rating comparison, sentiment comparison)
+        """
+        has_sentiment = 'sentiment_label' in df.columns
+        combined = df[['rating']]
+        if has_sentiment:
+            labels = pd.get_dummies(df['sentiment_label'], dtype='int64')
+            combined = pd.concat([combined, labels], axis=1)
+        grouped = combined.groupby(df['bank'], observed=True)
+        
+        ratings = grouped.agg({'rating': ['mean', 'std', 'count']}).round(2)
+        ratings.columns = ['avg_rating', 'std_rating', 'review_count']
+        ratings = ratings.sort_values('avg_rating', ascending=False)
+        
+        if not has_sentiment:
+            return ratings, pd.DataFrame()
+        
+        # Keep only labels and banks that occur, as crosstab does
+        counts = grouped[list(labels.columns)].sum()
+        counts = counts.loc[counts.sum(axis=1) > 0, counts.sum(axis=0) > 0]
+        label_dtype = df['sentiment_label'].dtype
+        if isinstance(label_dtype, pd.CategoricalDtype):
+            counts.columns = pd.CategoricalIndex(counts.columns, dtype=label_dtype)
+        counts.columns.name = 'sentiment_label'
+        sentiment = counts.div(counts.sum(axis=1), axis=0) * 100
+        return ratings, sentiment.round(2)
+    
     def compare_themes(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
         """
         Compare theme frequency across banks.
@@ -183,35 +260,30 @@ class BankComparator:
         theme_col = 'themes' if 'themes' in df.columns else 'themes_str'
         theme_comparisons = {}
         
-        # Extract all unique themes
-        all_themes = set()
-        for themes in df[theme_col]:
-            if pd.notna(themes) and themes != 'None':
-                if isinstance(themes, str):
-                    if ';' in themes:
-                        all_themes.update([t.strip() for t in themes.split(';')])
-                    else:
-                        all_themes.add(themes)
-                elif isinstance(themes, list):
-                    all_themes.update(themes)
-        
-        # Count themes per bank
+        # Split each review's themes once; get_dummies below then marks each
+        # theme at most once per review and a grouped sum counts per bank
+        themes = df[theme_col].reset_index(drop=True)
+        banks = pd.Series(df['bank'].to_numpy())
+        tagged = themes[themes.notna() & (themes != 'None')]
+        split = tagged.str.split(';')
+        split = split.where(split.notna(), tagged)
+        exploded = split.explode().str.strip()
+        exploded = exploded[exploded.notna() & (exploded != '')]
+        
+        # Unique themes, in order of first appearance
+        all_themes = exploded.unique()
+        
+        indicators = pd.get_dummies(exploded).groupby(level=0).any()
+        matrix = (
+            indicators.groupby(banks[indicators.index]).sum()
+            .reindex(index=banks.unique(), columns=all_themes, fill_value=0)
+        )
+        
         for theme in all_themes:
-            theme_counts = []
-            for bank in df['bank'].unique():
-                bank_df = df[df['bank'] == bank]
-                count = 0
-                for themes in bank_df[theme_col]:
-                    if pd.notna(themes) and themes != 'None':
-                        if isinstance(themes, str):
-                            theme_list = [t.strip() for t in themes.split(';')] if ';' in themes else [themes]
-                        else:
-                            theme_list = themes
-                        if theme in theme_list:
-                            count += 1
-                theme_counts.append({'Bank': bank, 'Count': count})
-            
-            theme_comparisons[theme] = pd.DataFrame(theme_counts)
+            theme_comparisons[theme] = pd.DataFrame({
+                'Bank': matrix.index.to_numpy(),
+                'Count': matrix[theme].to_numpy(dtype='int64')
+            })
         
         return theme_comparisons
 
@@ -306,19 +378,56 @@ class InsightsAnalyzer:
         self.comparator = BankComparator()
         self.recommendation_generator = RecommendationGenerator()
     
-    def analyze_bank(self, df: pd.DataFrame, bank_name: str) -> Dict[str, Any]:
+    def analyze_bank(self, df: pd.DataFrame, bank_name: str,
+                     cleaned: Optional[pd.Series] = None) -> Dict[str, Any]:
         """
         Analyze a specific bank.
         
         Args:
             df: DataFrame with reviews
             bank_name: Name of the bank
+            cleaned: Reviews of df after TextProcessor.clean_series, in the
+                same row order; computed per analyzer if omitted
         
         Returns:
             Dictionary with analysis results
         """
-        drivers = self.driver_analyzer.identify_drivers(df, bank_name)
-        pain_points = self.pain_point_analyzer.identify_pain_points(df, bank_name)
+        bank_rows = (df['bank'] == bank_name).to_numpy()
+        if cleaned is not None:
+            cleaned = cleaned[bank_rows]
+        return self.analyze_bank_pregrouped(df[bank_rows], bank_name, cleaned=cleaned)
+    
+    def analyze_bank_pregrouped(self, bank_df: pd.DataFrame, bank_name: str,
+                                cleaned: Optional[pd.Series] = None) -> Dict[str, Any]:
+        """
+        Analyze a bank whose reviews are already sliced out.
+        
+        Args:
+            bank_df: DataFrame with only this bank's reviews
+            bank_name: Name of the bank
+            cleaned: Reviews of bank_df after TextProcessor.clean_series, in
+                the same row order; computed per analyzer if omitted
+        
+        Returns:
+            Dictionary with analysis results
+        """
+        # Split the reviews by rating once and share the slices: positive
+        # (4-5 stars) feed drivers, negative (1-2 stars) pain points
+        ratings = bank_df['rating'].to_numpy()
+        positive = ratings >= 4
+        negative = ratings <= 2
+        
+        if cleaned is None:
+            positive_cleaned = negative_cleaned = None
+        else:
+            positive_cleaned, negative_cleaned = cleaned[positive], cleaned[negative]
+        
+        drivers = self.driver_analyzer.identify_drivers(
+            bank_df[positive], cleaned=positive_cleaned
+        )
+        pain_points = self.pain_point_analyzer.identify_pain_points(
+            bank_df[negative], cleaned=negative_cleaned
+        )
         recommendations = self.recommendation_generator.generate_recommendations(
             drivers, pain_points, bank_name
         )
@@ -330,19 +439,37 @@ class InsightsAnalyzer:
             'recommendations': recommendations
         }
     
-    def analyze_all_banks(self, df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    def analyze_all_banks(self, df: pd.DataFrame,
+                          cleaned: Optional[pd.Series] = None) -> Dict[str, Dict[str, Any]]:
         """
         Analyze all banks.
         
         Args:
             df: DataFrame with reviews
+            cleaned: Reviews of df after TextProcessor.clean_series, in the
+                same row order; computed here if omitted
         
         Returns:
             Dictionary of analysis results per bank
         """
+        # Clean all reviews once, then hand each bank only its own rows
+        if cleaned is None:
+            cleaned = TextProcessor.clean_series(df['review'])
+        
+        groups = df.groupby('bank', sort=False, observed=True).indices
+        
+        # Banks are independent, so large datasets analyze them in parallel
+        workers = min(os.cpu_count() or 1, len(groups))
+        if workers > 1 and len(df) >= PARALLEL_MIN_REVIEWS:
+            bank_results = Parallel(n_jobs=workers)(
+                delayed(self.analyze_bank_pregrouped)(df.iloc[rows], bank, cleaned=cleaned.iloc[rows])
+                for bank, rows in groups.items()
+            )
+            return dict(zip(groups, bank_results))
+        
         results = {}
-        for bank in df['bank'].unique():
-            results[bank] = self.analyze_bank(df, bank)
+        for bank, rows in groups.items():
+            results[bank] = self.analyze_bank_pregrouped(df.iloc[rows], bank, cleaned=cleaned.iloc[rows])
         return results
     
     def compare_banks(self, df: pd.DataFrame) -> Dict[str, Any]:
@@ -355,9 +482,10 @@ class InsightsAnalyzer:
         Returns:
             Dictionary with comparison results
         """
+        ratings, sentiment = self.comparator.compare_ratings_and_sentiment(df)
         return {
-            'ratings': self.comparator.compare_ratings(df),
-            'sentiment': self.comparator.compare_sentiment(df),
+            'ratings': ratings,
+            'sentiment': sentiment,
             'themes': self.comparator.compare_themes(df)
         }
 
@@ -430,8 +558,9 @@ class InsightsReportGenerator:
         
         if 'ratings' in comparison_results:
             report.append("\nAverage Ratings:")
-            for bank, row in comparison_results['ratings'].iterrows():
-                report.append(f"  {bank}: {row['avg_rating']:.2f} (from {int(row['review_count'])} reviews)")
+            ratings = comparison_results['ratings'][['avg_rating', 'review_count']]
+            for bank, avg_rating, review_count in ratings.itertuples(name=None):
+                report.append(f"  {bank}: {avg_rating:.2f} (from {int(review_count)} reviews)")
         
         report.append("\n" + "=" * 70)
         
@@ -455,19 +584,64 @@ class InsightsPipeline:
     """Complete pipeline for insights analysis."""
     
     def __init__(self, input_file: str = '../Data/all_banks.csv',
-                 output_dir: str = '../Data'):
+                 output_dir: str = '../Data',
+                 cache_dir: Optional[str] = None):
         """
         Initialize insights pipeline.
         
         Args:
             input_file: Path to input CSV
             output_dir: Directory for output files
+            cache_dir: Directory for the loaded and cleaned reviews as
+                Parquet, reused while the input file is unchanged
+                (disabled if None)
         """
         self.input_file = input_file
         self.output_dir = output_dir
+        self.cache_dir = cache_dir
         self.analyzer = InsightsAnalyzer()
         self.report_generator = InsightsReportGenerator(output_dir)
     
+    def _cache_file(self) -> str:
+        """
+        Path of the review cache for the current input file.
+        
+        Returns:
+            Parquet path keyed by the input's path, size and modification time
+        """
+        stat = os.stat(self.input_file)
+        key = repr((os.path.abspath(self.input_file), stat.st_size, stat.st_mtime_ns))
+        return os.path.join(self.cache_dir, f"insights_{hashlib.sha1(key.encode()).hexdigest()}.parquet")
+    
+    def load_reviews(self) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        Load the reviews and their cleaned text, from the cache if possible.
+        
+        Returns:
+            Tuple of (reviews DataFrame, cleaned review texts)
+        """
+        cache_file = self._cache_file() if self.cache_dir else None
+        if cache_file and os.path.exists(cache_file):
+            df = pd.read_parquet(cache_file)
+            print(f"✓ Loaded {len(df)} cached reviews from {cache_file}")
+            return df, df.pop('_clean_review')
+        
+        df = read_reviews(self.input_file, columns=INSIGHTS_COLUMNS)
+        print(f"✓ Loaded {len(df)} reviews from {self.input_file}")
+        
+        # Low-cardinality labels as categoricals, so per-bank filters,
+        # groupby and crosstab compare int codes rather than strings, and
+        # ratings in the smallest integer type (CSV input already loads
+        # this way; Parquet keeps stored dtypes)
+        df = df.astype({column: 'category' for column in ('bank', 'sentiment_label') if column in df.columns})
+        df['rating'] = pd.to_numeric(df['rating'], downcast='integer')
+        cleaned = TextProcessor.clean_series(df['review'])
+        
+        if cache_file:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.assign(_clean_review=cleaned).to_parquet(cache_file, compression='zstd', index=False)
+        return df, cleaned
+    
     def run(self) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
         """
         Run the complete insights analysis pipeline.
@@ -481,12 +655,11 @@ class InsightsPipeline:
         if not os.path.exists(self.input_file):
             raise FileNotFoundError(f"Input file not found: {self.input_file}")
         
-        df = pd.read_csv(self.input_file)
-        print(f"✓ Loaded {len(df)} reviews from {self.input_file}")
+        df, cleaned = self.load_reviews()
         
         # Analyze all banks
         print("\nAnalyzing banks...")
-        analysis_results = self.analyzer.analyze_all_banks(df)
+        analysis_results = self.analyzer.analyze_all_banks(df, cleaned=cleaned)
         
         # Compare banks
         print("Comparing banks...")
@@ -4,8 +4,52 @@ Common helper classes used across all task scripts.
 """
 
 import pandas as pd
+import numpy as np
 import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+# Prefer the multithreaded Arrow CSV parser when pyarrow is installed
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# Review text as Arrow-backed strings (NaN for missing), so .str methods run
+# over packed UTF-8 buffers; pandas 3 infers this dtype already, earlier
+# releases build object columns (and before 2.3 lack the NaN variant)
+try:
+    TEXT_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan) if CSV_ENGINE == 'pyarrow' else None
+except TypeError:
+    TEXT_DTYPE = None
+
+# Free-text columns of the review tables
+TEXT_COLUMNS = ('review', 'themes_str')
+
+# Compact dtypes for cleaned review data: ratings are always 1-5 and
+# bank/source only take a handful of distinct values
+COMPACT_DTYPES = {'rating': 'int8', 'bank': 'category', 'source': 'category'}
+
+# Dtypes of the review tables written by the pipeline stages; ratings
+# read from files may be blank, so they load as float rather than int8
+REVIEW_FILE_DTYPES = {
+    **COMPACT_DTYPES,
+    'rating': 'float32',
+    'sentiment_label': 'category',
+    'sentiment_score': 'float32',
+    **({column: TEXT_DTYPE for column in TEXT_COLUMNS} if TEXT_DTYPE is not None else {})
+}
+
+# Text cleaning patterns, compiled once at import
+URL_PATTERN = re.compile(r'http\S+|www\S+')
+EMAIL_PATTERN = re.compile(r'\S+@\S+')
+# Whitespace to rewrite as one space: runs, or a lone tab/newline. Single
+# spaces are left alone, so most of the text is never substituted
+WHITESPACE_PATTERN = re.compile(r'\s{2,}|[^\S ]')
+
+# Characters whose handling differs between Python and Arrow string kernels
+# (non-ASCII case mapping and whitespace, vertical tab, separator controls)
+NON_PORTABLE_TEXT_PATTERN = re.compile(r'[^\x00-\x7f]|[\x0b\x1c-\x1f]')
 
 
 class TextProcessor:
@@ -29,16 +73,58 @@ class TextProcessor:
         text = text.lower()
         
         # Remove URLs
-        text = re.sub(r'http\S+|www\S+', '', text)
+        text = URL_PATTERN.sub('', text)
         
         # Remove email addresses
-        text = re.sub(r'\S+@\S+', '', text)
+        text = EMAIL_PATTERN.sub('', text)
         
         # Remove extra whitespace
         text = ' '.join(text.split())
         
         return text
     
+    @staticmethod
+    def clean_series(texts: pd.Series) -> pd.Series:
+        """
+        Clean a whole column of texts with vectorized string methods.
+        
+        Gives the same result as clean_text(str(value)) for each value;
+        missing values become empty strings.
+        
+        Args:
+            texts: Series of raw text values
+        
+        Returns:
+            Series of cleaned text strings
+        """
+        texts = texts.where(texts.notna(), '').astype(str)
+        
+        # Reviews repeat a lot ('Good', 'Nice app'), so clean each distinct
+        # text once and spread the results back over the rows
+        codes, uniques = pd.factorize(texts)
+        if len(uniques) < len(texts):
+            cleaned = TextProcessor._clean_distinct(pd.Series(uniques, dtype=texts.dtype))
+            return pd.Series(cleaned.to_numpy()[codes], index=texts.index,
+                             dtype=cleaned.dtype, name=texts.name)
+        return TextProcessor._clean_distinct(texts)
+    
+    @staticmethod
+    def _clean_distinct(texts: pd.Series) -> pd.Series:
+        """Run the vectorized clean over non-missing strings."""
+        cleaned = (
+            texts.str.lower()
+            .str.replace(URL_PATTERN.pattern, '', regex=True)
+            .str.replace(EMAIL_PATTERN.pattern, '', regex=True)
+            .str.replace(WHITESPACE_PATTERN.pattern, ' ', regex=True)
+            .str.strip()
+        )
+        
+        # Rows the string kernels may treat differently take the slow path
+        slow = texts.str.contains(NON_PORTABLE_TEXT_PATTERN.pattern, regex=True)
+        if slow.any():
+            cleaned[slow] = texts[slow].map(TextProcessor.clean_text)
+        return cleaned
+    
     @staticmethod
     def validate_rating(rating: Any) -> Optional[int]:
         """
@@ -57,6 +143,27 @@ class TextProcessor:
         except (ValueError, TypeError):
             pass
         return None
+    
+    @staticmethod
+    def validate_rating_series(ratings: pd.Series) -> pd.Series:
+        """
+        Validate a column of ratings without a per-value try/except.
+        
+        Gives the same result as validate_rating for each value.
+        
+        Args:
+            ratings: Series of rating values
+        
+        Returns:
+            Nullable Int8 Series of valid ratings, missing where invalid
+        """
+        values = pd.to_numeric(ratings, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        valid = (values >= 1) & (values <= 5)
+        # Truncated toward zero, as int() does
+        valid_ratings = np.zeros(len(values), dtype=np.int8)
+        valid_ratings[valid] = values[valid]
+        return pd.Series(pd.arrays.IntegerArray(valid_ratings, ~valid),
+                         index=ratings.index, name=ratings.name)
 
 
 class DataValidator:
@@ -87,6 +194,87 @@ class DataValidator:
             stats['avg_sentiment_score'] = bank_df['sentiment_score'].mean()
         
         return stats
+    
+    @staticmethod
+    def get_all_bank_stats(df: pd.DataFrame) -> Dict[Any, Dict[str, Any]]:
+        """
+        Get get_bank_stats statistics for every bank from one grouping pass.
+        
+        Args:
+            df: DataFrame with reviews
+        
+        Returns:
+            Dictionary mapping each bank (in order of appearance) to its
+            statistics dictionary
+        """
+        grouped = df.groupby('bank', sort=False, observed=True)
+        has_rating = 'rating' in df.columns
+        has_sentiment = 'sentiment_label' in df.columns
+        
+        if has_rating:
+            avg_ratings = grouped['rating'].mean()
+            rating_counts = grouped['rating'].value_counts()
+        if has_sentiment:
+            sentiment_counts = grouped['sentiment_label'].value_counts()
+            avg_scores = grouped['sentiment_score'].mean()
+        
+        all_stats = {}
+        for bank, total in grouped.size().items():
+            stats = {
+                'total_reviews': int(total),
+                'avg_rating': avg_ratings[bank] if has_rating else None,
+                'rating_distribution': rating_counts[bank].to_dict() if has_rating else None,
+            }
+            
+            if has_sentiment:
+                stats['sentiment_distribution'] = sentiment_counts[bank].to_dict()
+                stats['avg_sentiment_score'] = avg_scores[bank]
+            
+            all_stats[bank] = stats
+        
+        return all_stats
+
+
+def read_reviews(file_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read a review table saved as Parquet or CSV.
+    
+    CSV columns are parsed straight into REVIEW_FILE_DTYPES and dates into
+    datetimes, so the parser skips type inference and no object columns
+    are built for bank, source or sentiment labels.
+    
+    Args:
+        file_path: Path ending in .parquet, or any CSV path
+        columns: Columns to load, skipping any the file lacks (all
+            columns if omitted)
+    
+    Returns:
+        DataFrame with the stored reviews
+    """
+    if file_path.endswith('.parquet'):
+        # Parquet already stores the dtypes it was written with
+        if columns is not None:
+            import pyarrow.parquet as pq
+            stored = pq.read_schema(file_path).names
+            columns = [column for column in columns if column in stored]
+        df = pd.read_parquet(file_path, columns=columns)
+        if 'rating' in df.columns:
+            # Nullable integer ratings would carry pd.NA into comparisons
+            df['rating'] = df['rating'].astype(REVIEW_FILE_DTYPES['rating'])
+        if TEXT_DTYPE is not None:
+            text = [column for column in TEXT_COLUMNS if column in df.columns and df[column].dtype != TEXT_DTYPE]
+            df = df.astype(dict.fromkeys(text, TEXT_DTYPE))
+        return df
+    
+    header = pd.read_csv(file_path, nrows=0).columns
+    present = [column for column in (columns or header) if column in header]
+    return pd.read_csv(
+        file_path,
+        engine=CSV_ENGINE,
+        usecols=present,
+        dtype={column: dtype for column, dtype in REVIEW_FILE_DTYPES.items() if column in present},
+        parse_dates=['date'] if 'date' in present else None
+    )
 
 
 # Backward compatibility - keep old function names